@@ -1,20 +1,39 @@
 # Try to import gcloud exceptions
 try:
     from google.api_core.exceptions import (
+        Aborted,
         AlreadyExists,
         ClientError,
         Conflict,
         NotFound,
     )
 except ImportError:
-    from mockfirestore.exceptions import ClientError, Conflict, NotFound, AlreadyExists
+    from mockfirestore.exceptions import (
+        Aborted,
+        AlreadyExists,
+        ClientError,
+        Conflict,
+        NotFound,
+    )
 
+from mockfirestore._cache import QueryCacheStats
 from mockfirestore._helpers import Timestamp
+from mockfirestore.aggregation import (
+    AggregationQuery,
+    AggregationResult,
+    AsyncAggregationQuery,
+)
 from mockfirestore.async_client import AsyncMockFirestore
 from mockfirestore.async_collection import AsyncCollectionReference
 from mockfirestore.async_document import AsyncDocumentReference
 from mockfirestore.async_query import AsyncQuery
-from mockfirestore.async_transaction import AsyncTransaction
+from mockfirestore.async_transaction import AsyncTransaction, async_transactional
+from mockfirestore.batch import (
+    AsyncWriteBatch,
+    BulkWriteFailure,
+    BulkWriter,
+    WriteBatch,
+)
 from mockfirestore.client import MockFirestore
 from mockfirestore.collection import CollectionReference
 from mockfirestore.document import DocumentReference, DocumentSnapshot
@@ -25,8 +44,9 @@ from mockfirestore.field_filter import (
     create_filter,
     or_filter,
 )
-from mockfirestore.query import Query
-from mockfirestore.transaction import Transaction
+from mockfirestore.query import Query, QueryExplanation
+from mockfirestore.transaction import Transaction, transactional
+from mockfirestore.watch import ChangeType, DocumentChange, Watch
 
 __all__ = [
     "MockFirestore",
@@ -34,13 +54,27 @@ __all__ = [
     "DocumentReference",
     "CollectionReference",
     "Query",
+    "QueryExplanation",
+    "QueryCacheStats",
+    "AggregationQuery",
+    "AggregationResult",
     "Timestamp",
     "Transaction",
+    "transactional",
+    "WriteBatch",
+    "BulkWriter",
+    "BulkWriteFailure",
+    "Watch",
+    "DocumentChange",
+    "ChangeType",
     "AsyncMockFirestore",
     "AsyncDocumentReference",
     "AsyncCollectionReference",
     "AsyncQuery",
+    "AsyncAggregationQuery",
     "AsyncTransaction",
+    "async_transactional",
+    "AsyncWriteBatch",
     "FieldFilter",
     "CompositeFilter",
     "create_filter",
@@ -50,4 +84,5 @@ __all__ = [
     "Conflict",
     "NotFound",
     "AlreadyExists",
+    "Aborted",
 ]
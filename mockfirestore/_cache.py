@@ -0,0 +1,95 @@
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from mockfirestore._helpers import Document
+
+# (collection reference, document ID, stored document, stored times) of each
+# result, in query order.
+Results = list[tuple[Any, str, Document, Any]]
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class QueryCacheStats:
+    """Counters of the query result cache of a client."""
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+    max_bytes: int
+
+
+class QueryCache:
+    """
+    Results of recent queries, each stored with the version of its collection when
+    it ran. A write bumps the version, so entries of queries that ran before it are
+    dropped instead of being returned. The least recently used entries are evicted
+    once the cache outgrows `max_bytes`.
+
+    Results share their documents with the store, so the size of an entry only
+    counts the lists and tuples holding them. Queries on several threads may use
+    the cache at once, so it is locked.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        if max_bytes <= 0:
+            raise ValueError("The query cache needs a positive memory budget.")
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, tuple[int, Results, int]] = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, version: int) -> Results | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key: tuple, version: int, results: Results):
+        size = sys.getsizeof(results) + sum(map(sys.getsizeof, results))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (version, results, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _discard(self, key: tuple):
+        _, _, size = self._entries.pop(key)
+        self._size -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> QueryCacheStats:
+        with self._lock:
+            return QueryCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=len(self._entries),
+                size_bytes=self._size,
+                max_bytes=self.max_bytes,
+            )
@@ -0,0 +1,115 @@
+import base64
+import json
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from mockfirestore.document import DocumentReference
+
+try:
+    from google.cloud.firestore_v1 import GeoPoint
+except ImportError:
+
+    class GeoPoint(NamedTuple):
+        latitude: float
+        longitude: float
+
+
+# Values that plain data cannot hold are written as {TYPE_KEY: tag, "value": ...}.
+TYPE_KEY = "__type__"
+_PLAIN = {str, int, float, bool, type(None)}
+# Subclasses of plain types, such as enums, are written as their base value.
+_BASES = {str: str.__str__, int: int.__int__, float: float.__float__}
+# Reused, as json.dumps builds a new encoder per call when given options.
+_JSON_ENCODER = json.JSONEncoder(check_circular=False, separators=(",", ":"))
+
+
+class Encoder:
+    """
+    Turns document values into plain data: dicts, lists, strings, numbers,
+    booleans and None, plus bytes and tuples when `binary`. Timestamps, document
+    references, geopoints and, unless `binary`, bytes become tagged maps, and so
+    do maps that happen to have a TYPE_KEY field. `tagged` tells whether any value
+    was tagged, as values without tags need no decoding.
+
+    Values that need no change are returned as they are, not copied.
+    """
+
+    def __init__(self, binary: bool = False) -> None:
+        self.binary = binary
+        self.tagged = False
+
+    def encode(self, value: Any) -> Any:
+        if type(value) in _PLAIN:
+            return value
+        if isinstance(value, dict):
+            encoded = {key: self.encode(item) for key, item in value.items()}
+            if TYPE_KEY in value:
+                return self._tag("map", encoded)
+            if type(value) is dict and all(
+                encoded[key] is item for key, item in value.items()
+            ):
+                return value
+            return encoded
+        if isinstance(value, GeoPoint):
+            return self._tag("geopoint", [value.latitude, value.longitude])
+        if isinstance(value, (list, tuple)):
+            encoded = [self.encode(item) for item in value]
+            if type(value) in (list, tuple) and all(
+                new is old for new, old in zip(encoded, value)
+            ):
+                return value
+            return (
+                tuple(encoded) if self.binary and isinstance(value, tuple) else encoded
+            )
+        for base, convert in _BASES.items():
+            if isinstance(value, base):
+                return convert(value)
+        if isinstance(value, datetime):
+            return self._tag("timestamp", value.isoformat())
+        if isinstance(value, bytes):
+            if self.binary:
+                return value
+            return self._tag("bytes", base64.b64encode(value).decode("ascii"))
+        if isinstance(value, DocumentReference):
+            return self._tag("reference", "/".join(value._path))
+        if hasattr(value, "latitude") and hasattr(value, "longitude"):
+            return self._tag("geopoint", [value.latitude, value.longitude])
+        raise TypeError(f"Cannot encode a value of type {type(value).__name__}.")
+
+    def _tag(self, tag: str, value: Any) -> dict:
+        self.tagged = True
+        return {TYPE_KEY: tag, "value": value}
+
+
+def decode(value: Any, reference: Callable[[list[str]], Any]) -> Any:
+    """
+    Turns values written by an `Encoder` back into document values. `reference`
+    makes the document reference of a path.
+    """
+    if isinstance(value, dict):
+        tag = value.get(TYPE_KEY)
+        if tag is None:
+            return {key: decode(item, reference) for key, item in value.items()}
+        item = value["value"]
+        if tag == "map":
+            return {key: decode(field, reference) for key, field in item.items()}
+        if tag == "timestamp":
+            return datetime.fromisoformat(item)
+        if tag == "bytes":
+            return base64.b64decode(item)
+        if tag == "reference":
+            return reference(item.split("/"))
+        if tag == "geopoint":
+            return GeoPoint(*item)
+        raise ValueError(f"Unknown value type: {tag!r}")
+    if isinstance(value, list):
+        return [decode(item, reference) for item in value]
+    if isinstance(value, tuple):
+        return tuple(decode(item, reference) for item in value)
+    return value
+
+
+def dumps_line(record: dict) -> str:
+    """`record` as a compact JSON line."""
+    return _JSON_ENCODER.encode(record) + "\n"
@@ -1,16 +1,20 @@
 import operator
 import random
 import string
-from collections.abc import AsyncIterable, Iterator, Sequence
+import time
+from collections.abc import AsyncIterable, Iterable, Iterator, Sequence
+from copy import deepcopy
 from datetime import datetime as dt
-from functools import reduce
+from datetime import timezone
+from functools import reduce, total_ordering
 from typing import Any, TypeVar
 
 T = TypeVar("T")
 KeyValuePair = tuple[str, dict[str, Any]]
 Document = dict[str, Any]
 Collection = dict[str, Document]
-Store = dict[str, Collection]
+
+_NANOS_PER_SECOND = 1_000_000_000
 
 
 def get_by_path(
@@ -41,32 +45,126 @@ def delete_by_path(data: dict[str, T], path: Sequence[str]):
     del get_by_path(data, path[:-1])[path[-1]]
 
 
+def copy_paths(document: Document, field_paths: Iterable[str]) -> Document:
+    """
+    Shallow copy of a document in which every map or array along `field_paths` is
+    copied too, so that those paths can be modified in place. Everything else is
+    shared with the original document.
+    """
+    document = dict(document)
+    copies = set()
+    for field_path in field_paths:
+        node = document
+        for key in field_path.split("."):
+            if not isinstance(node, dict) or key not in node:
+                break
+            child = node[key]
+            if isinstance(child, (dict, list)) and id(child) not in copies:
+                child = node[key] = child.copy()
+                copies.add(id(child))
+            node = child
+    return document
+
+
+def project(document: Document, field_paths: Iterable[str]) -> Document:
+    """
+    Copy of only the fields of a document at `field_paths`, as a read with a field
+    mask returns it. Only the values at those paths are copied; paths missing from
+    the document are left out.
+    """
+    projected: Document = {}
+    for field_path in field_paths:
+        keys = field_path.split(".")
+        value = document
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            node = projected
+            for key in keys[:-1]:
+                node = node.setdefault(key, {})
+            node[keys[-1]] = deepcopy(value)
+    return projected
+
+
 def generate_random_string():
     return "".join(
         random.choice(string.ascii_letters + string.digits) for _ in range(20)
     )
 
 
+@total_ordering
 class Timestamp:
     """
-    Imitates some properties of `google.protobuf.timestamp_pb2.Timestamp`
+    Imitates some properties of `google.protobuf.timestamp_pb2.Timestamp`: a point
+    in time as whole `seconds` since the epoch and the `nanos` after them.
+    Timestamps are values, compared and hashed by the time they hold, and must not
+    be modified.
     """
 
-    def __init__(self, timestamp: float):
-        self._timestamp = timestamp
+    __slots__ = ("nanos", "seconds")
+
+    def __init__(self, seconds: float, nanos: int = 0):
+        if isinstance(seconds, float):
+            seconds, fraction = divmod(seconds, 1)
+            nanos += round(fraction * _NANOS_PER_SECOND)
+        carry, self.nanos = divmod(nanos, _NANOS_PER_SECOND)
+        self.seconds = int(seconds) + carry
 
     @classmethod
     def from_now(cls):
-        timestamp = dt.now().timestamp()
-        return cls(timestamp)
+        return cls.from_nanoseconds(time.time_ns())
+
+    @classmethod
+    def from_nanoseconds(cls, nanoseconds: int) -> "Timestamp":
+        timestamp = cls.__new__(cls)
+        timestamp.seconds, timestamp.nanos = divmod(nanoseconds, _NANOS_PER_SECOND)
+        return timestamp
+
+    def ToNanoseconds(self) -> int:
+        return self.seconds * _NANOS_PER_SECOND + self.nanos
+
+    def ToDatetime(self) -> dt:
+        return dt.fromtimestamp(self.seconds, tz=timezone.utc).replace(
+            microsecond=self.nanos // 1000
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Timestamp):
+            return NotImplemented
+        return self.seconds == other.seconds and self.nanos == other.nanos
+
+    def __lt__(self, other):
+        if not isinstance(other, Timestamp):
+            return NotImplemented
+        return (self.seconds, self.nanos) < (other.seconds, other.nanos)
+
+    def __hash__(self):
+        return hash((self.seconds, self.nanos))
+
+    def __repr__(self):
+        return f"Timestamp(seconds={self.seconds}, nanos={self.nanos})"
+
+
+class DocumentTimes:
+    """
+    When a document was created, and when it was last written to. The store keeps
+    one per existing document, next to its fields, and replaces it on every write
+    rather than modifying it, so snapshots can hold on to it.
+    """
+
+    __slots__ = ("create_time", "update_time")
 
-    @property
-    def seconds(self):
-        return str(self._timestamp).split(".")[0]
+    def __init__(self, create_time: Timestamp, update_time: Timestamp) -> None:
+        self.create_time = create_time
+        self.update_time = update_time
 
-    @property
-    def nanos(self):
-        return str(self._timestamp).split(".")[1]
+    def __repr__(self):
+        return (
+            f"DocumentTimes(create_time={self.create_time!r}, "
+            f"update_time={self.update_time!r})"
+        )
 
 
 def get_document_iterator(
@@ -0,0 +1,545 @@
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from datetime import datetime, timezone
+from functools import total_ordering
+from operator import itemgetter
+from typing import Any
+
+from mockfirestore._helpers import Document
+
+RANGE_OPERATORS = frozenset(("<", "<=", ">", ">="))
+INDEXED_OPERATORS = RANGE_OPERATORS | {
+    "==",
+    "in",
+    "array_contains",
+    "array_contains_any",
+}
+DIRECTIONS = ("ASCENDING", "DESCENDING")
+
+# (lower key, lower inclusive, upper key, upper inclusive)
+Bounds = tuple[tuple, bool, tuple, bool]
+# (leading components of a query sort key, inclusive)
+Cursor = tuple[tuple, bool]
+
+_MISSING = object()
+_UNHASHABLE = object()
+
+
+def get_field_value(document: Document, path: list[str]) -> Any:
+    """Value at `path` inside `document`, or `_MISSING` if there is none."""
+    for key in path:
+        if not isinstance(document, dict) or key not in document:
+            return _MISSING
+        document = document[key]
+    return document
+
+
+def _hash_key(value: Any) -> Any:
+    """
+    A hashable stand-in for `value` that compares equal exactly when the values
+    do, or `_UNHASHABLE` if there is none.
+    """
+    if isinstance(value, list):
+        keys = tuple(_hash_key(item) for item in value)
+        return _UNHASHABLE if _UNHASHABLE in keys else (list, keys)
+    if isinstance(value, dict):
+        keys = tuple((key, _hash_key(item)) for key, item in value.items())
+        if any(item is _UNHASHABLE for _, item in keys):
+            return _UNHASHABLE
+        return (dict, frozenset(keys))
+    if isinstance(value, float) and math.isnan(value):
+        # NaN never equals anything, not even itself.
+        return _UNHASHABLE
+    try:
+        hash(value)
+    except TypeError:
+        return _UNHASHABLE
+    return value
+
+
+def order_key(value: Any) -> tuple:
+    """
+    Sort key that orders values of any type the way Firestore does: null, booleans,
+    numbers, timestamps, strings, bytes, references, geopoints, arrays, then maps.
+    """
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return 1, value
+    if isinstance(value, (int, float)):
+        # NaN sorts before every other number.
+        return (2, -math.inf, 0) if math.isnan(value) else (2, value, 1)
+    if isinstance(value, datetime):
+        return 3, value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, str):
+        return 4, value
+    if isinstance(value, bytes):
+        return 5, value
+
+    from mockfirestore.document import DocumentReference
+
+    if isinstance(value, DocumentReference):
+        return 6, tuple(value._path)
+    if hasattr(value, "latitude") and hasattr(value, "longitude"):
+        return 7, value.latitude, value.longitude
+    if isinstance(value, (list, tuple)):
+        return 8, tuple(order_key(item) for item in value)
+    if isinstance(value, dict):
+        return 9, tuple((key, order_key(item)) for key, item in sorted(value.items()))
+    return 10, type(value).__name__, str(value)
+
+
+def range_key(value: Any) -> tuple | None:
+    """
+    Position of `value` in a sorted index, or None if range filters cannot match it.
+    A range filter only ever matches values of the same type as its own value.
+    """
+    return None if value is None else order_key(value)
+
+
+def range_bounds(filters: Iterable[tuple[str, Any]]) -> Bounds | None:
+    """
+    The interval of sorted index keys matched by every `(op, value)` range filter,
+    or None if one of the values cannot be ordered.
+    """
+    lower, upper = ((), True), ((math.inf,), True)
+    for op, value in filters:
+        key = range_key(value)
+        if key is None:
+            return None
+        rank = key[0]
+        if op in ("<", "<="):
+            lower = max(lower, ((rank,), True), key=_lower_tightness)
+            upper = min(upper, (key, op == "<="))
+        else:
+            lower = max(lower, (key, op == ">="), key=_lower_tightness)
+            upper = min(upper, ((rank + 1,), False))
+    return (*lower, *upper)
+
+
+def _lower_tightness(bound: tuple[tuple, bool]) -> tuple[tuple, bool]:
+    key, inclusive = bound
+    return key, not inclusive
+
+
+def _bisect_bounds(entries: Sequence, bounds: Bounds, key) -> tuple[int, int]:
+    """Positions of the first and past-the-last entry of `entries` within `bounds`."""
+    lower, lower_inclusive, upper, upper_inclusive = bounds
+    start_search = bisect_left if lower_inclusive else bisect_right
+    end_search = bisect_right if upper_inclusive else bisect_left
+    start = start_search(entries, lower, key=key)
+    end = end_search(entries, upper, start, key=key)
+    return start, end
+
+
+@total_ordering
+class Descending:
+    """Wraps a sort key so that it sorts in reverse."""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key: Any) -> None:
+        self.key = key
+
+    def __eq__(self, other: "Descending") -> bool:
+        return self.key == other.key
+
+    def __lt__(self, other: "Descending") -> bool:
+        return other.key < self.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"Descending({self.key!r})"
+
+
+class FieldIndex:
+    """
+    Indexes a single field path of every document in a collection: a hash index
+    for equality, a sorted index for range filters and an element index for
+    array membership. Once a range of the sorted index has been handed out, the
+    next write copies the index rather than modify it, so the range stays valid
+    while it is iterated.
+    """
+
+    def __init__(self, field_path: str) -> None:
+        self.field_path = field_path
+        self._path = field_path.split(".")
+        self._equal: dict[Any, set[str]] = {}
+        self._sorted: list[tuple[tuple, str]] = []
+        self._shared = False
+        self._elements: dict[Any, set[str]] = {}
+
+    def add(self, doc_id: str, document: Document):
+        entry = self._add_keys(doc_id, document)
+        if entry is not None:
+            entries = self._writable()
+            entries.insert(bisect_left(entries, entry), entry)
+
+    def build(self, documents: dict[str, Document]):
+        """Indexes every document of a collection, sorting the entries once."""
+        entries = (
+            self._add_keys(doc_id, document) for doc_id, document in documents.items()
+        )
+        self._sorted = sorted(entry for entry in entries if entry is not None)
+
+    def _add_keys(self, doc_id: str, document: Document) -> tuple[tuple, str] | None:
+        """
+        Adds a document to the hash indexes and returns its entry in the sorted
+        index, or None if it lacks the field.
+        """
+        value = get_field_value(document, self._path)
+        if value is _MISSING:
+            return None
+
+        entry = (order_key(value), doc_id)
+        if value is None:
+            return entry
+
+        key = _hash_key(value)
+        if key is not _UNHASHABLE:
+            self._equal.setdefault(key, set()).add(doc_id)
+
+        if isinstance(value, list):
+            for element in value:
+                key = _hash_key(element)
+                if key is not _UNHASHABLE:
+                    self._elements.setdefault(key, set()).add(doc_id)
+        return entry
+
+    def remove(self, doc_id: str, document: Document):
+        value = get_field_value(document, self._path)
+        if value is _MISSING:
+            return
+
+        entry = (order_key(value), doc_id)
+        position = bisect_left(self._sorted, entry)
+        if position < len(self._sorted) and self._sorted[position] == entry:
+            del self._writable()[position]
+        if value is None:
+            return
+
+        key = _hash_key(value)
+        if key is not _UNHASHABLE:
+            _discard(self._equal, key, doc_id)
+
+        if isinstance(value, list):
+            for element in value:
+                key = _hash_key(element)
+                if key is not _UNHASHABLE:
+                    _discard(self._elements, key, doc_id)
+
+    def lookup(self, op: str, value: Any) -> set[str] | None:
+        """
+        IDs of the documents whose field may satisfy `op value`, or None if this
+        index cannot answer the filter. The returned set must not be modified.
+        """
+        if op == "==":
+            return self._lookup(self._equal, [value])
+        elif op == "in":
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                return None
+            return self._lookup(self._equal, value)
+        elif op == "array_contains":
+            return self._lookup(self._elements, [value])
+        elif op == "array_contains_any":
+            if not isinstance(value, (list, tuple, set, frozenset)):
+                return None
+            return self._lookup(self._elements, value)
+        elif op in RANGE_OPERATORS:
+            bounds = range_bounds([(op, value)])
+            if bounds is None:
+                return None
+            return set(self.range_ids(bounds))
+        return None
+
+    @staticmethod
+    def _lookup(index: dict[Any, set[str]], values: Iterable[Any]) -> set[str] | None:
+        keys = [_hash_key(value) for value in values]
+        if _UNHASHABLE in keys:
+            return None
+        if len(keys) == 1:
+            return index.get(keys[0], set())
+        return set().union(*(index.get(key, ()) for key in keys))
+
+    def range_ids(self, bounds: Bounds, descending: bool = False) -> "IndexRange":
+        """IDs of the documents whose value lies within `bounds`, in value order."""
+        start, end = _bisect_bounds(self._sorted, bounds, key=_entry_key)
+        self._shared = True
+        return IndexRange(self._sorted, start, end, key=_identity, reverse=descending)
+
+    def _writable(self) -> list[tuple[tuple, str]]:
+        if self._shared:
+            self._sorted = self._sorted.copy()
+            self._shared = False
+        return self._sorted
+
+
+class CompositeIndex:
+    """
+    Documents of a collection sorted by several fields, each ascending or
+    descending, as declared in `firestore.indexes.json`. Documents that lack one
+    of the fields are left out. Ties are broken by document ID, in the direction
+    of the last field. Like the sorted index of a field, the entries are copied on
+    the first write after a range of them has been handed out.
+    """
+
+    def __init__(self, fields: Sequence[tuple[str, str]]) -> None:
+        self.fields = tuple(fields)
+        self._paths = [field_path.split(".") for field_path, _ in fields]
+        self._descending = [direction == "DESCENDING" for _, direction in fields]
+        self._entries: list[tuple[tuple, str]] = []
+        self._shared = False
+
+    @property
+    def name_descending(self) -> bool:
+        """Whether documents with equal fields are sorted by descending ID."""
+        return self._descending[-1]
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{field_path} {'DESC' if direction == 'DESCENDING' else 'ASC'}"
+            for field_path, direction in self.fields
+        )
+        return f"({fields})"
+
+    def _entry(self, doc_id: str, document: Document) -> tuple[tuple, str] | None:
+        key = []
+        for path, descending in zip(self._paths, self._descending):
+            if path == ["__name__"]:
+                value = doc_id
+            else:
+                value = get_field_value(document, path)
+            if value is _MISSING:
+                return None
+            component = order_key(value)
+            key.append(Descending(component) if descending else component)
+        key.append(Descending(doc_id) if self.name_descending else doc_id)
+        return tuple(key), doc_id
+
+    def add(self, doc_id: str, document: Document):
+        entry = self._entry(doc_id, document)
+        if entry is not None:
+            entries = self._writable()
+            entries.insert(bisect_left(entries, entry), entry)
+
+    def build(self, documents: dict[str, Document]):
+        """Indexes every document of a collection, sorting the entries once."""
+        entries = (
+            self._entry(doc_id, document) for doc_id, document in documents.items()
+        )
+        self._entries = sorted(entry for entry in entries if entry is not None)
+
+    def remove(self, doc_id: str, document: Document):
+        entry = self._entry(doc_id, document)
+        if entry is not None:
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._writable()[position]
+
+    def _writable(self) -> list[tuple[tuple, str]]:
+        if self._shared:
+            self._entries = self._entries.copy()
+            self._shared = False
+        return self._entries
+
+    def prefix_key(self, values: Sequence[Any]) -> tuple | None:
+        """The index key of documents whose leading fields equal `values`."""
+        key = []
+        for value, descending in zip(values, self._descending):
+            component = range_key(value)
+            if component is None:
+                return None
+            key.append(Descending(component) if descending else component)
+        return tuple(key)
+
+    def span(self, prefix: tuple, bounds: Bounds | None = None) -> tuple[int, int]:
+        """
+        Positions of the entries starting with `prefix` whose next field lies within
+        `bounds`.
+        """
+        length = len(prefix)
+        if bounds is None:
+            return _bisect_bounds(
+                self._entries,
+                (prefix, True, prefix, True),
+                key=lambda entry: entry[0][:length],
+            )
+        lower, lower_inclusive, upper, upper_inclusive = bounds
+        if self._descending[length]:
+            lower, lower_inclusive, upper, upper_inclusive = (
+                Descending(upper),
+                upper_inclusive,
+                Descending(lower),
+                lower_inclusive,
+            )
+        return _bisect_bounds(
+            self._entries,
+            (
+                (*prefix, lower),
+                lower_inclusive,
+                (*prefix, upper),
+                upper_inclusive,
+            ),
+            key=lambda entry: entry[0][: length + 1],
+        )
+
+    def doc_ids(self, start: int, end: int, prefix_length: int) -> "IndexRange":
+        """
+        IDs of the entries between `start` and `end`, which all share their first
+        `prefix_length` fields.
+        """
+        self._shared = True
+        return IndexRange(
+            self._entries, start, end, key=lambda entry: entry[0][prefix_length:]
+        )
+
+
+class IndexRange(Sequence):
+    """
+    The items of a slice of sorted entries, such as the document IDs of an index,
+    read lazily and in query order. `key` gives the query sort key of an entry and
+    `item` the value read from it; with `reverse`, the query reads the entries
+    backwards and its sort key is `key` wrapped in `Descending`.
+    """
+
+    def __init__(
+        self,
+        entries: list,
+        start: int,
+        end: int,
+        key: Callable[[Any], tuple],
+        reverse: bool = False,
+        item: Callable[[Any], Any] = itemgetter(1),
+    ) -> None:
+        self._entries = entries
+        self._start = start
+        self._end = max(start, end)
+        self._key = key
+        self._reverse = reverse
+        self._item = item
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, position: int) -> Any:
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if self._reverse:
+            return self._item(self._entries[self._end - 1 - position])
+        return self._item(self._entries[self._start + position])
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._reverse:
+            positions = range(self._end - 1, self._start - 1, -1)
+        else:
+            positions = range(self._start, self._end)
+        for position in positions:
+            yield self._item(self._entries[position])
+
+    def between(self, start: Cursor | None, end: Cursor | None) -> "IndexRange":
+        """
+        The part of the range from the `start` cursor to the `end` cursor, found by
+        binary search. Cursors give the leading components of a query sort key.
+        """
+        lower, upper = start, end
+        if self._reverse:
+            lower, upper = _unwrap_cursor(end), _unwrap_cursor(start)
+        first, last = self._start, self._end
+        if lower is not None:
+            values, inclusive = lower
+            search = bisect_left if inclusive else bisect_right
+            first = search(
+                self._entries, values, first, last, key=self._prefix_key(len(values))
+            )
+        if upper is not None:
+            values, inclusive = upper
+            search = bisect_right if inclusive else bisect_left
+            last = search(
+                self._entries, values, first, last, key=self._prefix_key(len(values))
+            )
+        return IndexRange(
+            self._entries, first, last, self._key, self._reverse, self._item
+        )
+
+    def _prefix_key(self, length: int) -> Callable[[Any], tuple]:
+        return lambda entry: self._key(entry)[:length]
+
+
+def _unwrap_cursor(cursor: Cursor | None) -> Cursor | None:
+    if cursor is None:
+        return None
+    values, inclusive = cursor
+    return tuple(value.key for value in values), inclusive
+
+
+class CollectionIndex:
+    """
+    The field indexes built so far over the documents of one collection. Indexes
+    are built by readers of the collection, several of which may ask for the same
+    one at once, so building is serialized.
+    """
+
+    def __init__(self) -> None:
+        self.fields: dict[str, FieldIndex] = {}
+        self.composites: dict[tuple[tuple[str, str], ...], CompositeIndex] = {}
+        self._building = threading.Lock()
+
+    def field(self, field_path: str, documents: dict[str, Document]) -> FieldIndex:
+        """Returns the index of `field_path`, building it on first use."""
+        field_index = self.fields.get(field_path)
+        if field_index is None:
+            with self._building:
+                field_index = self.fields.get(field_path)
+                if field_index is None:
+                    field_index = FieldIndex(field_path)
+                    field_index.build(documents)
+                    self.fields[field_path] = field_index
+        return field_index
+
+    def composite(
+        self, fields: tuple[tuple[str, str], ...], documents: dict[str, Document]
+    ) -> CompositeIndex:
+        """Returns the composite index over `fields`, building it on first use."""
+        composite_index = self.composites.get(fields)
+        if composite_index is None:
+            with self._building:
+                composite_index = self.composites.get(fields)
+                if composite_index is None:
+                    composite_index = CompositeIndex(fields)
+                    composite_index.build(documents)
+                    self.composites[fields] = composite_index
+        return composite_index
+
+    def add(self, doc_id: str, document: Document):
+        for field_index in self.fields.values():
+            field_index.add(doc_id, document)
+        for composite_index in self.composites.values():
+            composite_index.add(doc_id, document)
+
+    def remove(self, doc_id: str, document: Document):
+        for field_index in self.fields.values():
+            field_index.remove(doc_id, document)
+        for composite_index in self.composites.values():
+            composite_index.remove(doc_id, document)
+
+
+def _entry_key(entry: tuple[tuple, str]) -> tuple:
+    return entry[0]
+
+
+def _identity(entry: Any) -> Any:
+    return entry
+
+
+def _discard(index: dict[Any, set[str]], key: Any, doc_id: str):
+    doc_ids = index.get(key)
+    if doc_ids is not None:
+        doc_ids.discard(doc_id)
+        if not doc_ids:
+            del index[key]
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import Any
+
+from mockfirestore._codec import Encoder, decode, dumps_line
+from mockfirestore._helpers import Document, Timestamp
+
+# Each line of a journal is one JSON record:
+#   {"writes": [[path, document or null], ...]}, applied together, with
+#   "tagged": true if the documents have tagged values to decode, and "time",
+#   the commit time in nanoseconds since the epoch, unless it only created an
+#   empty placeholder,
+#   {"collection": path}, a collection created empty,
+#   {"reset": true}, every document dropped,
+#   {"load": path}, every document replaced by those of a snapshot file.
+DEFAULT_SYNC_EVERY = 100
+DEFAULT_SYNC_INTERVAL = 1.0
+
+
+class Journal:
+    """
+    Appends records to a log file. Writes are buffered, and the file is only
+    synced to disk once `sync_every` records have piled up, or `sync_interval`
+    seconds after the first record left unsynced, so a crash may lose the last
+    few records but never corrupts the earlier ones.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+    ) -> None:
+        self.path = path
+        self._sync_every = sync_every
+        self._sync_interval = sync_interval
+        # Kept open for the journal's lifetime, and closed by `close()`.
+        self._file = open(path, "a", encoding="utf-8")  # noqa: SIM115
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        # Syncs the records left unsynced once `sync_interval` has passed.
+        self._timer: threading.Timer | None = None
+
+    def write(
+        self,
+        writes: Iterable[tuple[Sequence[str], Document | None]],
+        commit_time: Timestamp | None = None,
+    ):
+        """
+        Records `(path, document)` writes committed together at `commit_time`;
+        None deletes. Plain documents are dumped as they are, as records without
+        tags are replayed without decoding.
+        """
+        record: dict[str, Any] = {
+            "writes": [["/".join(path), document] for path, document in writes]
+        }
+        if commit_time is not None:
+            record["time"] = commit_time.ToNanoseconds()
+        try:
+            line = dumps_line(record)
+        except TypeError:
+            encoder = Encoder()
+            for write in record["writes"]:
+                write[1] = encoder.encode(write[1])
+            record["tagged"] = True
+            line = dumps_line(record)
+        self._append(line)
+
+    def create_collection(self, path: Sequence[str]):
+        self._append(dumps_line({"collection": "/".join(path)}))
+
+    def reset(self):
+        self._append(dumps_line({"reset": True}))
+
+    def load(self, path: str):
+        self._append(dumps_line({"load": os.path.abspath(path)}))
+
+    def _append(self, line: str):
+        with self._lock:
+            self._file.write(line)
+            self._unsynced += 1
+            if self._unsynced >= self._sync_every:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._sync_interval, self._sync_due)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _sync_due(self):
+        with self._lock:
+            # A sync may have come first, and another timer been started since.
+            if self._timer is threading.current_thread():
+                self._timer = None
+                self._sync()
+
+    def sync(self):
+        """Writes the buffered records to disk."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+
+
+def read_journal(
+    log: str | Iterable[str], reference: Callable[[list[str]], Any]
+) -> Iterator[tuple[str, Any]]:
+    """
+    The records of a journal, given as a path or as lines, as `(kind, value)`
+    pairs. The value of a "writes" record is its `(path, document)` writes and
+    its commit time, or None if it has none. A last line cut short by a crash is
+    skipped.
+    """
+    if isinstance(log, str):
+        with open(log, encoding="utf-8") as f:
+            yield from read_journal(f, reference)
+        return
+
+    for number, line in enumerate(log, 1):
+        if not line.endswith("\n"):
+            return
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f"Invalid journal record on line {number}.") from error
+        if "writes" in record:
+            writes = [(path.split("/"), data) for path, data in record["writes"]]
+            if record.get("tagged"):
+                writes = [
+                    (path, None if data is None else decode(data, reference))
+                    for path, data in writes
+                ]
+            commit_time = record.get("time")
+            if commit_time is not None:
+                commit_time = Timestamp.from_nanoseconds(commit_time)
+            yield "writes", (writes, commit_time)
+        elif "collection" in record:
+            yield "collection", record["collection"].split("/")
+        elif "reset" in record:
+            yield "reset", None
+        elif "load" in record:
+            yield "load", record["load"]
+        else:
+            raise ValueError(f"Invalid journal record on line {number}.")
@@ -0,0 +1,106 @@
+import threading
+from collections.abc import Callable
+
+
+class _Held:
+    """A context manager that holds one side of a `ReadWriteLock`."""
+
+    __slots__ = ("_acquire", "_release")
+
+    def __init__(self, acquire: Callable[[], None], release: Callable[[], None]):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._release()
+
+
+class ReadWriteLock:
+    """
+    Lets any number of threads read at once, or a single thread write. Both sides
+    are reentrant, and the writing thread may also read. Threads waiting to write
+    hold back new readers, so a steady stream of reads cannot starve them.
+
+    A thread that only holds the read side cannot write; it would wait for itself.
+    """
+
+    __slots__ = (
+        "_condition",
+        "_readers",
+        "_sleeping",
+        "_waiting",
+        "_writer",
+        "_writes",
+        "read",
+        "write",
+    )
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        # Thread ident to how many times that thread holds the read side.
+        self._readers: dict[int, int] = {}
+        self._writer: int | None = None
+        self._writes = 0
+        # Threads waiting to write, and threads waiting at all.
+        self._waiting = 0
+        self._sleeping = 0
+        self.read = _Held(self.acquire_read, self.release_read)
+        self.write = _Held(self.acquire_write, self.release_write)
+
+    def acquire_read(self):
+        thread = threading.get_ident()
+        with self._condition:
+            count = self._readers.get(thread)
+            if count is not None:
+                self._readers[thread] = count + 1
+                return
+            if self._writer != thread:
+                while self._writer is not None or self._waiting:
+                    self._wait()
+            self._readers[thread] = 1
+
+    def release_read(self):
+        thread = threading.get_ident()
+        with self._condition:
+            count = self._readers[thread] - 1
+            if count:
+                self._readers[thread] = count
+                return
+            del self._readers[thread]
+            if not self._readers and self._sleeping:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        thread = threading.get_ident()
+        with self._condition:
+            if self._writer == thread:
+                self._writes += 1
+                return
+            if thread in self._readers:
+                raise RuntimeError("Cannot write while holding the read lock.")
+            self._waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._wait()
+            finally:
+                self._waiting -= 1
+            self._writer = thread
+            self._writes = 1
+
+    def release_write(self):
+        with self._condition:
+            self._writes -= 1
+            if not self._writes:
+                self._writer = None
+                if self._sleeping:
+                    self._condition.notify_all()
+
+    def _wait(self):
+        self._sleeping += 1
+        try:
+            self._condition.wait()
+        finally:
+            self._sleeping -= 1
@@ -0,0 +1,200 @@
+import operator
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Collection, Sequence
+from functools import partial
+from typing import Any
+
+from mockfirestore._helpers import Document
+from mockfirestore._index import (
+    _MISSING,
+    _UNHASHABLE,
+    RANGE_OPERATORS,
+    _hash_key,
+    get_field_value,
+    order_key,
+)
+
+Predicate = Callable[[Document], bool]
+
+_CACHE_SIZE = 256
+_cache: OrderedDict[tuple, Predicate] = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Each comparison is bound to the filter value with the operands swapped, so
+# `x < value` becomes `value > x`.
+_COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.gt,
+    "<=": operator.ge,
+    ">": operator.lt,
+    ">=": operator.le,
+}
+
+
+def compile_filters(filters: Sequence[tuple[str, str, Any]]) -> Predicate:
+    """
+    Compiles `(field, op, value)` filters into a single predicate over stored
+    documents. Predicates are cached by filter signature, so identical queries
+    share them.
+
+    A document without the field, or with a null value, never matches; a null
+    filter value matches every other value. Like the indexes, range filters only
+    match values of the same type as their own, and array filters only arrays.
+    """
+    signature = filter_signature(filters)
+    if signature is None:
+        return _compile(filters)
+
+    with _cache_lock:
+        predicate = _cache.get(signature)
+        if predicate is not None:
+            _cache.move_to_end(signature)
+            return predicate
+
+    predicate = _compile(filters)
+    with _cache_lock:
+        _cache[signature] = predicate
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return predicate
+
+
+def filter_signature(filters: Sequence[tuple[str, str, Any]]) -> tuple | None:
+    """
+    A hashable key equal for filters that match the same documents, or None if a
+    filter value cannot be hashed.
+    """
+    signature = tuple(
+        (field, op, type(value), _signature_key(value)) for field, op, value in filters
+    )
+    if any(key is _UNHASHABLE for *_, key in signature):
+        return None
+    return signature
+
+
+def _signature_key(value: Any) -> Any:
+    key = _hash_key(value)
+    if key is _UNHASHABLE or not isinstance(value, (list, tuple, dict)):
+        return key
+    # Equal arrays and maps may still hold values of other types, as [1] and
+    # [True] do, which filters match differently.
+    return key, order_key(value)
+
+
+def _compile(filters: Sequence[tuple[str, str, Any]]) -> Predicate:
+    checks = [_compile_filter(field, op, value) for field, op, value in filters]
+    if not checks:
+        return _match_all
+    if len(checks) == 1:
+        return checks[0]
+
+    def predicate(document: Document) -> bool:
+        for check in checks:
+            if not check(document):
+                return False
+        return True
+
+    return predicate
+
+
+def _compile_filter(field: str, op: str, value: Any) -> Predicate:
+    compare = _compile_comparison(op, value)
+    path = field.split(".")
+    if len(path) == 1:
+        key = path[0]
+
+        def check(document: Document) -> bool:
+            field_value = document.get(key)
+            return field_value is not None and compare(field_value)
+
+    else:
+
+        def check(document: Document) -> bool:
+            field_value = get_field_value(document, path)
+            return (
+                field_value is not _MISSING
+                and field_value is not None
+                and compare(field_value)
+            )
+
+    return check
+
+
+def _compile_comparison(op: str, value: Any) -> Callable[[Any], bool]:
+    if op in RANGE_OPERATORS:
+        if value is None:
+            return _match_all
+        return _range_comparison(op, value)
+    elif op in _COMPARISONS:
+        if value is None:
+            return _match_all
+        return partial(_COMPARISONS[op], value)
+    elif op == "in":
+        if value is None:
+            return _match_all
+        return _membership(value)
+    elif op == "array_contains":
+        if value is None:
+            return _match_all
+        return (
+            lambda field_value: isinstance(field_value, list) and value in field_value
+        )
+    elif op == "array_contains_any":
+        if value is None:
+            return _match_all
+        contains = _membership(value)
+        return lambda field_value: isinstance(field_value, list) and any(
+            contains(element) for element in field_value
+        )
+    raise ValueError(f"Unsupported filter operator: {op!r}")
+
+
+def _range_comparison(op: str, value: Any) -> Callable[[Any], bool]:
+    """
+    Compares values the way the sorted index of a field does: a range filter only
+    matches values of the same type as its own, so values that cannot be compared
+    with it never match rather than raise.
+    """
+    comparison = _COMPARISONS[op]
+    key = order_key(value)
+    rank = key[0]
+
+    def check(field_value: Any) -> bool:
+        field_key = order_key(field_value)
+        return field_key[0] == rank and comparison(key, field_key)
+
+    value_type = type(value)
+    if value_type not in (int, str):
+        return check
+
+    # Values of these types compare directly the same way as their sort keys.
+    def check_direct(field_value: Any) -> bool:
+        if type(field_value) is value_type:
+            return comparison(value, field_value)
+        return check(field_value)
+
+    return check_direct
+
+
+def _membership(values: Collection) -> Callable[[Any], bool]:
+    """Tests `x in values`, through a frozenset when the values are hashable."""
+    if not isinstance(values, (list, tuple, set, frozenset)):
+        return partial(operator.contains, values)
+    try:
+        lookup = frozenset(values)
+    except TypeError:
+        return partial(operator.contains, values)
+
+    def contains(x: Any) -> bool:
+        try:
+            return x in lookup
+        except TypeError:
+            return x in values
+
+    return contains
+
+
+def _match_all(_: Any) -> bool:
+    return True
@@ -0,0 +1,60 @@
+import weakref
+from collections.abc import Sequence
+from typing import Any
+
+from mockfirestore._store import Store
+
+
+class Reference:
+    """
+    Base of document and collection references. References are interned in their
+    store: asking for a path that a live reference of the same type already points
+    to returns that reference, rather than a new one. They compare and hash by
+    path, so references of the same path are interchangeable either way.
+
+    The path of a reference must not be modified.
+    """
+
+    __slots__ = ("__weakref__", "_data", "_key", "_path", "parent")
+
+    def __new__(cls, data: Store, path: Sequence[str], parent: Any = None):
+        return cls._interned(data, tuple(path), parent)
+
+    @classmethod
+    def _interned(cls, data: Store, key: tuple[str, ...], parent: Any):
+        """The reference interned for the path `key`, made if there is none."""
+        interned = data.references.get((cls, key))
+        if interned is not None:
+            reference = interned()
+            if reference is not None:
+                if reference.parent is None:
+                    reference.parent = parent
+                return reference
+        reference = object.__new__(cls)
+        reference._data = data
+        reference._path = list(key)
+        reference._key = key
+        reference.parent = parent
+        # Another thread may intern the same path meanwhile; either one is kept.
+        data.references[cls, key] = weakref.ref(reference)
+        if len(data.references) > data.references_limit:
+            data.prune_references()
+        return reference
+
+    def __eq__(self, other):
+        if not isinstance(other, Reference):
+            return NotImplemented
+        return self._key == other._key and self._data is other._data
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # References stored in documents point into the same store, not a copy.
+        return self
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {'/'.join(self._path)!r}>"
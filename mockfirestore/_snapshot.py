@@ -0,0 +1,190 @@
+import marshal
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Callable
+from typing import Any, BinaryIO
+
+from mockfirestore._codec import Encoder, decode
+from mockfirestore._helpers import Collection, DocumentTimes, Timestamp
+from mockfirestore._store import Store, Times
+
+# A snapshot file is the magic, a header of the format version, the Python
+# version that wrote it and the offset of its table of contents, two marshal
+# blobs per collection, {document ID: document} and {document ID: (create time,
+# update time)} in nanoseconds, then the table of contents: a marshal blob of
+# {"collections", "index_definitions", "last_commit"}, where "collections" lists
+# (path, offset, length, tagged, times offset, times length) per collection.
+# The marshal format may change between Python versions, so a snapshot is only
+# read by the Python version that wrote it.
+MAGIC = b"MOCKFS\x00\x01"
+VERSION = 3
+_HEADER = struct.Struct("<HBBQ")
+_PYTHON = sys.version_info[:2]
+
+
+class _UnloadedCollection:
+    """A collection of a memory-mapped snapshot file, decoded on `load()`."""
+
+    __slots__ = ("_buffer", "_entry", "_reference")
+
+    def __init__(
+        self,
+        buffer: mmap.mmap,
+        entry: tuple[int, int, bool, int, int],
+        reference: Callable[[list[str]], Any],
+    ) -> None:
+        self._buffer = buffer
+        # (offset, length, tagged, times offset, times length)
+        self._entry = entry
+        self._reference = reference
+
+    def raw(self) -> tuple[bytes, bool, bytes]:
+        """
+        The encoded blob of the collection, whether it has tagged values, and the
+        encoded blob of its times.
+        """
+        offset, length, tagged, times_offset, times_length = self._entry
+        return (
+            self._buffer[offset : offset + length],
+            tagged,
+            self._buffer[times_offset : times_offset + times_length],
+        )
+
+    def load(self) -> tuple[Collection, Times]:
+        blob, tagged, times_blob = self.raw()
+        collection = marshal.loads(blob)
+        if tagged:
+            collection = {
+                doc_id: decode(document, self._reference)
+                for doc_id, document in collection.items()
+            }
+        return collection, _decode_times(times_blob)
+
+
+def save(store: Store, path: str):
+    """
+    Writes every collection of `store`, and its declared composite indexes, to a
+    snapshot file at `path`. Each collection is read under its own read lock, and
+    collections that were loaded from a snapshot but never read are copied as they
+    are, without decoding.
+
+    The file is written aside and then moved to `path`, so a snapshot that is
+    still mapped, such as the one the store was loaded from, can be overwritten.
+    """
+    partial_path = f"{path}.partial"
+    try:
+        with open(partial_path, "wb") as f:
+            _write(store, f)
+        os.replace(partial_path, path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+
+def _write(store: Store, f: BinaryIO):
+    f.write(MAGIC)
+    f.write(_HEADER.pack(VERSION, *_PYTHON, 0))
+    entries = []
+    for collection_path in store.collection_paths():
+        with store.reading(collection_path):
+            unloaded = store.unloaded(collection_path)
+            if isinstance(unloaded, _UnloadedCollection):
+                blob, tagged, times_blob = unloaded.raw()
+            else:
+                times = store.collection_times(collection_path)
+                blob, tagged = _encode(store.collection(collection_path))
+                times_blob = _encode_times(times)
+        offset = f.tell()
+        f.write(blob)
+        entries.append(
+            (collection_path, offset, len(blob), tagged, f.tell(), len(times_blob))
+        )
+        f.write(times_blob)
+    contents_offset = f.tell()
+    contents = {
+        "collections": entries,
+        "index_definitions": dict(store.index_definitions),
+        "last_commit": store.last_commit_time().ToNanoseconds(),
+    }
+    f.write(marshal.dumps(contents))
+    f.seek(len(MAGIC))
+    f.write(_HEADER.pack(VERSION, *_PYTHON, contents_offset))
+
+
+def _encode(collection: Collection) -> tuple[bytes, bool]:
+    """
+    The blob of a collection and whether it has tagged values. Collections of
+    plain values are dumped as they are: they are never decoded, so they need no
+    tags or escapes.
+    """
+    try:
+        return marshal.dumps(collection), False
+    except ValueError:
+        encoder = Encoder(binary=True)
+        return marshal.dumps(encoder.encode(collection)), encoder.tagged
+
+
+def _encode_times(times: Times) -> bytes:
+    """The blob of the times of a collection. Shared records are converted once."""
+    converted: dict[DocumentTimes, tuple[int, int]] = {}
+    encoded = {}
+    for doc_id, record in times.items():
+        pair = converted.get(record)
+        if pair is None:
+            pair = converted[record] = (
+                record.create_time.ToNanoseconds(),
+                record.update_time.ToNanoseconds(),
+            )
+        encoded[doc_id] = pair
+    return marshal.dumps(encoded)
+
+
+def _decode_times(blob: bytes) -> Times:
+    """
+    The times of a collection. Documents written by the same commits share their
+    record, as they do when written in memory.
+    """
+    records: dict[tuple[int, int], DocumentTimes] = {}
+    times = {}
+    for doc_id, pair in marshal.loads(blob).items():
+        record = records.get(pair)
+        if record is None:
+            create_time, update_time = pair
+            record = records[pair] = DocumentTimes(
+                Timestamp.from_nanoseconds(create_time),
+                Timestamp.from_nanoseconds(update_time),
+            )
+        times[doc_id] = record
+    return times
+
+
+def load(store: Store, path: str, reference: Callable[[list[str]], Any]):
+    """
+    Registers the collections of the snapshot file at `path` in an empty `store`,
+    unloaded. The file is memory-mapped, and each collection only decoded on first
+    access. `reference` makes the document reference of a path.
+    """
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + _HEADER.size)
+        if len(header) < len(MAGIC) + _HEADER.size or header[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a mockfirestore snapshot: {path}")
+        version, major, minor, contents_offset = _HEADER.unpack_from(header, len(MAGIC))
+        if version != VERSION:
+            raise ValueError(f"Unsupported snapshot version: {version}")
+        if (major, minor) != _PYTHON:
+            raise ValueError(
+                f"Snapshot {path} was written by Python {major}.{minor}, whose"
+                f" marshal format Python {_PYTHON[0]}.{_PYTHON[1]} may not read."
+            )
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    contents = marshal.loads(buffer[contents_offset:])
+
+    for collection_path, *entry in contents["collections"]:
+        store.add_unloaded(
+            collection_path, _UnloadedCollection(buffer, tuple(entry), reference)
+        )
+    store.index_definitions = contents["index_definitions"]
+    store.advance_commit_time(Timestamp.from_nanoseconds(contents["last_commit"]))
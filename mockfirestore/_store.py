@@ -0,0 +1,717 @@
+import itertools
+import threading
+import time
+import weakref
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Protocol
+
+from mockfirestore._cache import QueryCache
+from mockfirestore._helpers import Collection, Document, DocumentTimes, Timestamp
+from mockfirestore._index import DIRECTIONS, CollectionIndex
+from mockfirestore._lock import ReadWriteLock
+
+if TYPE_CHECKING:
+    from mockfirestore._journal import Journal
+
+Path = tuple[str, ...]
+# Document ID to the times of each document of a collection that exists.
+Times = dict[str, DocumentTimes]
+# (document ID, document before, document after), where None is no document.
+Change = tuple[str, Document | None, Document | None]
+
+
+class Listener(Protocol):
+    def on_changes(self, collection_path: Path, changes: list[Change]) -> bool:
+        """
+        Takes in writes to a collection, while it is locked, and returns whether
+        that queued an event to deliver.
+        """
+
+    def deliver(self):
+        """Calls back with the queued events, outside of any lock."""
+
+
+class Unloaded(Protocol):
+    def load(self) -> tuple[Collection, Times]:
+        """
+        Reads the documents of a collection that has not been loaded yet, and
+        their times.
+        """
+
+
+# Interned references are not pruned while there are fewer entries than this.
+_MIN_REFERENCES_LIMIT = 1024
+
+# Writes to a collection that touch at least this share of its documents drop
+# its indexes, to be rebuilt on next use, instead of updating them one by one.
+_REBUILD_SHARE = 1 / 8
+
+
+class SortedIds:
+    """
+    The document IDs of a collection in ascending order. IDs added out of order
+    and removed IDs are held back and merged in on the next read, so a run of
+    writes costs a single sort.
+    """
+
+    __slots__ = ("_added", "_handed_out", "_ids", "_merging", "_removed")
+
+    def __init__(self, ids: list[str] | None = None) -> None:
+        # Given IDs must already be in ascending order.
+        self._ids: list[str] = [] if ids is None else ids
+        self._added: list[str] = []
+        self._removed: set[str] = set()
+        # Whether readers may hold `_ids`, so it must be copied before an append.
+        self._handed_out = False
+        # Readers of the collection may merge at the same time.
+        self._merging = threading.Lock()
+
+    def add(self, doc_id: str):
+        """Adds an ID that is not in the collection."""
+        if doc_id in self._removed:
+            self._removed.discard(doc_id)
+        elif not self._added and (not self._ids or self._ids[-1] < doc_id):
+            if self._handed_out:
+                self._ids = [*self._ids, doc_id]
+                self._handed_out = False
+            else:
+                self._ids.append(doc_id)
+        else:
+            self._added.append(doc_id)
+
+    def remove(self, doc_id: str):
+        self._removed.add(doc_id)
+
+    def ids(self) -> list[str]:
+        """
+        The IDs in ascending order. Later writes replace the list rather than
+        reorder it, so it can be iterated while the collection changes.
+        """
+        if self._added or self._removed:
+            with self._merging:
+                self._merge()
+        self._handed_out = True
+        return self._ids
+
+    def _merge(self):
+        ids = self._ids + self._added if self._added else self._ids
+        if self._removed:
+            ids = [doc_id for doc_id in ids if doc_id not in self._removed]
+        if self._added:
+            ids.sort()
+        self._ids = ids
+        self._added = []
+        self._removed = set()
+
+
+class Store:
+    """
+    The documents of a client, kept per collection under the collection's full
+    path. Subcollections live under their own path rather than inside their parent
+    document, so a document only ever holds its own fields. Next to its fields,
+    each document has a record of its create and update times, which are the
+    times of the commits that wrote it.
+
+    The store also keeps the field indexes built over its collections, the
+    composite indexes declared for them and, when enabled, a cache of query
+    results. Every write to a collection bumps its version, which invalidates the
+    cached results of queries over it.
+
+    Each collection has its own reader/writer lock: reads of different collections
+    run in parallel, and writes only wait for readers and writers of the
+    collections they touch. Collections are created and removed under a separate,
+    briefly held registry lock. Lists handed out to readers, such as sorted IDs,
+    are replaced rather than modified by later writes.
+
+    Listeners are told about writes while the collection is still locked, so they
+    see them in order, and call back once the writing thread has released all of
+    its write locks.
+
+    Collections read from a snapshot file can be registered unloaded: their
+    documents are only read on first access.
+
+    A store can be forked: the fork shares every collection with it, and either
+    store copies a shared collection on its first write to it.
+
+    References to the documents and collections of a store are interned in it,
+    weakly, so they last only as long as they are used.
+    """
+
+    def __init__(self) -> None:
+        self.collections: dict[Path, Collection] = {}
+        # Collection path to the times of its documents. Every collection has an
+        # entry, replaced along with it when it is copied or removed.
+        self.times: dict[Path, Times] = {}
+        # Parent document path, or () for the root, to the IDs of the collections
+        # under it, in creation order.
+        self.children: dict[Path, dict[str, None]] = {}
+        # Collection ID to the paths of every collection with that ID, for
+        # collection group queries.
+        self.groups: dict[str, dict[Path, None]] = {}
+        self.sorted_ids: dict[Path, SortedIds] = {}
+        self.indexes: dict[Path, CollectionIndex] = {}
+        self.index_definitions: dict[str, list[tuple[tuple[str, str], ...]]] = {}
+        # Collection path, or collection ID for groups, to a stamp that changes on
+        # every write to the collection.
+        self.versions: dict[Path, int] = {}
+        self.group_versions: dict[str, int] = {}
+        # Document path to a stamp that changes on every write to the document,
+        # for optimistic transactions. Missing documents have no stamp, nor do
+        # those not written since they were loaded or forked: they share a base
+        # stamp.
+        self.document_versions: dict[Path, int] = {}
+        self._base_version = 0
+        # Stamps come from one clock, so a version never takes a value twice.
+        self._clock = itertools.count(1)
+        # Nanoseconds since the epoch of the latest commit: commits later on are
+        # timed after it, even if the system clock goes back.
+        self._last_commit = 0
+        self._commit_lock = threading.Lock()
+        self.query_cache: QueryCache | None = None
+        # When set, every write is appended to it while its collection is locked.
+        self.journal: Journal | None = None
+        self._locks: dict[Path, ReadWriteLock] = {}
+        # Reentrant, as unregistering a collection may have to load it first.
+        self._registry_lock = threading.RLock()
+        # Collection path to the collections registered but not loaded yet. None
+        # until one is registered, so other stores skip the check.
+        self._unloaded: dict[Path, Unloaded] | None = None
+        # Paths of the collections shared with a fork, to copy before writing.
+        self._shared: set[Path] = set()
+        # Collection or document path, or collection ID for collection groups, to
+        # the listeners of it. The tuples are replaced rather than modified.
+        self.listeners: dict[Path, tuple[Listener, ...]] = {}
+        self.group_listeners: dict[str, tuple[Listener, ...]] = {}
+        # (reference type, path) to a weak reference to the document or collection
+        # reference interned for it. Entries of dead references are pruned once
+        # there are more than `references_limit` entries, which is then set to
+        # twice the live ones.
+        self.references: dict[tuple, weakref.ref] = {}
+        self.references_limit = _MIN_REFERENCES_LIMIT
+        # Per thread: how many `writing` blocks it is in, and the listeners with
+        # events to deliver once it leaves the outermost one.
+        self._local = threading.local()
+
+    def lock(self, path: Sequence[str]) -> ReadWriteLock:
+        """The reader/writer lock of the collection at `path`."""
+        path = tuple(path)
+        lock = self._locks.get(path)
+        if lock is None:
+            lock = self._locks.setdefault(path, ReadWriteLock())
+        return lock
+
+    def reading(self, path: Sequence[str]):
+        """Context manager holding the read lock of the collection at `path`."""
+        return self.lock(path).read
+
+    @contextmanager
+    def writing(self, paths: Iterable[Sequence[str]]) -> Iterator[None]:
+        """
+        Holds the write locks of the collections at `paths`. They are taken in
+        path order, so threads writing to several collections cannot deadlock.
+        Listeners are called back when the thread leaves its outermost block.
+        """
+        local = self._local
+        depth = getattr(local, "depth", 0)
+        if not depth:
+            local.pending = {}
+        local.depth = depth + 1
+        locks = []
+        try:
+            for path in sorted(set(map(tuple, paths))):
+                lock = self.lock(path)
+                lock.acquire_write()
+                locks.append(lock)
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release_write()
+            local.depth = depth
+            if not depth and local.pending:
+                pending, local.pending = local.pending, {}
+                for listener in pending:
+                    listener.deliver()
+
+    def collection(self, path: Sequence[str]) -> Collection:
+        """
+        The documents of the collection at `path`, which must not be modified.
+        Anything more than a single lookup must hold the collection's read lock.
+        """
+        collection = self._loaded(tuple(path))
+        return {} if collection is None else collection
+
+    def ensure_collection(self, path: Sequence[str]) -> Collection:
+        path = tuple(path)
+        collection = self._loaded(path)
+        if collection is None:
+            with self._registry_lock:
+                collection = self.collections.get(path)
+                if collection is None:
+                    collection = self.collections[path] = {}
+                    self.times[path] = {}
+                    self.children.setdefault(path[:-1], {})[path[-1]] = None
+                    self.groups.setdefault(path[-1], {})[path] = None
+                    if self.journal is not None:
+                        self.journal.create_collection(path)
+        return collection
+
+    def add_unloaded(self, path: Sequence[str], unloaded: Unloaded):
+        """Registers a collection whose documents are loaded when first read."""
+        path = tuple(path)
+        with self._registry_lock:
+            if self._unloaded is None:
+                self._unloaded = {}
+                self._base_version = next(self._clock)
+            self._unloaded[path] = unloaded
+            self.children.setdefault(path[:-1], {})[path[-1]] = None
+            self.groups.setdefault(path[-1], {})[path] = None
+
+    def unloaded(self, path: Sequence[str]) -> Unloaded | None:
+        """The collection at `path` if it has not been loaded yet."""
+        return None if self._unloaded is None else self._unloaded.get(tuple(path))
+
+    def collection_paths(self) -> list[Path]:
+        """The path of every collection, in creation order under each parent."""
+        with self._registry_lock:
+            return [
+                (*parent_path, collection_id)
+                for parent_path, collection_ids in self.children.items()
+                for collection_id in collection_ids
+            ]
+
+    def _loaded(self, path: Path) -> Collection | None:
+        """The collection at `path`, loading it if needed, or None if there is none."""
+        collection = self.collections.get(path)
+        if collection is None and self._unloaded is not None:
+            with self._registry_lock:
+                collection = self.collections.get(path)
+                unloaded = self._unloaded.get(path)
+                if collection is None and unloaded is not None:
+                    collection, times = unloaded.load()
+                    self.sorted_ids[path] = SortedIds(sorted(collection))
+                    self.times[path] = times
+                    self.collections[path] = collection
+                    del self._unloaded[path]
+        return collection
+
+    def _writable(self, path: Path) -> tuple[Collection, Times]:
+        """
+        The collection at `path` and the times of its documents, to write to while
+        holding its write lock. It is created if there is none, and copied if it is
+        shared with a fork, along with its times and sorted IDs; its indexes are
+        dropped, to be rebuilt on next use.
+        """
+        with self._registry_lock:
+            collection = self.ensure_collection(path)
+            times = self.times[path]
+            if path in self._shared:
+                self._shared.discard(path)
+                collection = self.collections[path] = dict(collection)
+                times = self.times[path] = dict(times)
+                ids = self.sorted_ids.get(path)
+                if ids is not None:
+                    self.sorted_ids[path] = SortedIds(list(ids.ids()))
+                self.indexes.pop(path, None)
+        return collection, times
+
+    def fork(self) -> "Store":
+        """
+        A copy of the store that shares its collections, sorted IDs and indexes
+        until either store writes to them, so it costs next to nothing however
+        many documents there are. Listeners and the journal are not copied.
+        """
+        while True:
+            with self._registry_lock:
+                paths = sorted(self.collections)
+            # Every collection is read locked, so none is halfway through a write.
+            with ExitStack() as stack:
+                for path in paths:
+                    stack.enter_context(self.reading(path))
+                with self._registry_lock:
+                    # Otherwise, a collection created meanwhile may be written to.
+                    if self.collections.keys() <= set(paths):
+                        return self._fork()
+
+    def _fork(self) -> "Store":
+        store = Store()
+        store.collections = dict(self.collections)
+        store.times = dict(self.times)
+        store.children = {path: dict(ids) for path, ids in self.children.items()}
+        store.groups = {
+            collection_id: dict(paths) for collection_id, paths in self.groups.items()
+        }
+        store.sorted_ids = dict(self.sorted_ids)
+        store.indexes = dict(self.indexes)
+        store.index_definitions = dict(self.index_definitions)
+        store.versions = dict(self.versions)
+        store.group_versions = dict(self.group_versions)
+        store._clock = itertools.count(next(self._clock))
+        store._base_version = next(store._clock)
+        store._last_commit = self._last_commit
+        if self._unloaded is not None:
+            store._unloaded = dict(self._unloaded)
+        if self.query_cache is not None:
+            store.query_cache = QueryCache(self.query_cache.max_bytes)
+        store._shared = set(self.collections)
+        self._shared.update(self.collections)
+        return store
+
+    def document_ids(self, path: Sequence[str]) -> list[str]:
+        """
+        The IDs of the documents of the collection at `path`, placeholders
+        included, in ascending order. The list must not be modified.
+        """
+        path = tuple(path)
+        self._loaded(path)
+        with self.reading(path):
+            ids = self.sorted_ids.get(path)
+            return [] if ids is None else ids.ids()
+
+    def collection_ids(self, parent_path: Sequence[str] = ()) -> list[str]:
+        with self._registry_lock:
+            return list(self.children.get(tuple(parent_path), ()))
+
+    def collection_group_paths(self, collection_id: str) -> list[Path]:
+        """The paths of every collection whose ID is `collection_id`."""
+        with self._registry_lock:
+            return list(self.groups.get(collection_id, ()))
+
+    def get_document(self, path: Sequence[str]) -> Document:
+        """The document at `path`, or an empty one if there is none."""
+        return self.collection(path[:-1]).get(path[-1], {})
+
+    def has_document(self, path: Sequence[str]) -> bool:
+        return path[-1] in self.collection(path[:-1])
+
+    def ensure_document(self, path: Sequence[str]):
+        """Creates an empty placeholder for the document at `path` if there is none."""
+        collection_path, doc_id = tuple(path[:-1]), path[-1]
+        if doc_id in (self._loaded(collection_path) or ()):
+            return
+        with self.lock(collection_path).write:
+            if doc_id not in self.ensure_collection(collection_path):
+                collection, _ = self._writable(collection_path)
+                collection[doc_id] = {}
+                self._add_id(collection_path, doc_id)
+                if self.journal is not None:
+                    self.journal.write([(path, {})])
+
+    def set_document(self, path: Sequence[str], document: Document) -> Timestamp:
+        """
+        Stores `document` at `path`, and returns the time of the commit. Stored
+        documents are shared with snapshots, so they must not be modified
+        afterwards.
+        """
+        collection_path, doc_id = tuple(path[:-1]), path[-1]
+        with self.writing((collection_path,)):
+            commit_time = self._commit_time()
+            if self.journal is not None:
+                self.journal.write([(path, document)], commit_time)
+            collection, times = self._writable(collection_path)
+            index = self.indexes.get(collection_path)
+            previous = collection.get(doc_id)
+            if previous is None:
+                self._add_id(collection_path, doc_id)
+            elif index is not None:
+                index.remove(doc_id, previous)
+            collection[doc_id] = document
+            _set_times(times, doc_id, document, DocumentTimes(commit_time, commit_time))
+            if index is not None:
+                index.add(doc_id, document)
+            self._stamp((*collection_path, doc_id))
+            self._bump(collection_path)
+            self._notify(collection_path, [(doc_id, previous, document)])
+        return commit_time
+
+    def delete_document(self, path: Sequence[str]):
+        """Deletes the document at `path`, along with all of its subcollections."""
+        collection_path, doc_id = tuple(path[:-1]), path[-1]
+        with self.writing((collection_path,)):
+            collection = self._loaded(collection_path) or {}
+            if doc_id not in collection:
+                raise KeyError(doc_id)
+            if self.journal is not None:
+                self.journal.write([(path, None)], self._commit_time())
+            collection, times = self._writable(collection_path)
+            previous = collection.pop(doc_id)
+            times.pop(doc_id, None)
+            index = self.indexes.get(collection_path)
+            if index is not None:
+                index.remove(doc_id, previous)
+            self.sorted_ids[collection_path].remove(doc_id)
+            self.document_versions.pop((*collection_path, doc_id), None)
+            self._bump(collection_path)
+            self._notify(collection_path, [(doc_id, previous, None)])
+            self._delete_subcollections((*collection_path, doc_id))
+
+    def apply_writes(
+        self,
+        writes: Iterable[tuple[Sequence[str], Document | None]],
+        bulk: bool = False,
+        commit_time: Timestamp | None = None,
+    ) -> Timestamp:
+        """
+        Applies `(path, document)` writes in order, where a None document deletes
+        the one at `path` if there is one, as one commit, and returns its time.
+        Writes are grouped by collection, so each collection's indexes and version
+        are updated once. Readers see either none or all of the writes to a
+        collection. `bulk` drops the indexes of the collections written to, however
+        few the writes, for runs of writes after which they are rebuilt at once.
+        `commit_time` times the commit, as when it is replayed, rather than now.
+        """
+        grouped: dict[Path, list[tuple[str, Document | None]]] = {}
+        for path, document in writes:
+            grouped.setdefault(tuple(path[:-1]), []).append((path[-1], document))
+
+        with self.writing(grouped):
+            commit_time = self._commit_time(commit_time)
+            if self.journal is not None:
+                self.journal.write(
+                    (
+                        ((*collection_path, doc_id), document)
+                        for collection_path, collection_writes in grouped.items()
+                        for doc_id, document in collection_writes
+                    ),
+                    commit_time,
+                )
+            for collection_path, collection_writes in grouped.items():
+                self._apply_collection_writes(
+                    collection_path, collection_writes, commit_time, bulk
+                )
+        return commit_time
+
+    def _apply_collection_writes(
+        self,
+        collection_path: Path,
+        writes: list[tuple[str, Document | None]],
+        commit_time: Timestamp,
+        bulk: bool = False,
+    ):
+        collection, times = self._writable(collection_path)
+        index = self.indexes.get(collection_path)
+        if index is not None and (
+            bulk or len(writes) >= len(collection) * _REBUILD_SHARE
+        ):
+            del self.indexes[collection_path]
+            index = None
+        ids = self.sorted_ids.get(collection_path)
+        if ids is None:
+            ids = self.sorted_ids.setdefault(collection_path, SortedIds())
+        created = DocumentTimes(commit_time, commit_time)
+
+        changes = []
+        for doc_id, document in writes:
+            previous = collection.get(doc_id)
+            if previous is not None and index is not None:
+                index.remove(doc_id, previous)
+            if document is None:
+                if previous is not None:
+                    del collection[doc_id]
+                    times.pop(doc_id, None)
+                    ids.remove(doc_id)
+                    self.document_versions.pop((*collection_path, doc_id), None)
+                    self._delete_subcollections((*collection_path, doc_id))
+                    changes.append((doc_id, previous, None))
+                continue
+            if previous is None:
+                ids.add(doc_id)
+            collection[doc_id] = document
+            _set_times(times, doc_id, document, created)
+            if index is not None:
+                index.add(doc_id, document)
+            self._stamp((*collection_path, doc_id))
+            changes.append((doc_id, previous, document))
+        self._bump(collection_path)
+        self._notify(collection_path, changes)
+
+    def _delete_subcollections(self, document_path: Path):
+        """
+        Unregisters the collections under `document_path`. Their own locks are not
+        taken: writers still holding a removed collection only modify a detached
+        copy of it.
+        """
+        with self._registry_lock:
+            self._unregister_subcollections(document_path)
+
+    def _unregister_subcollections(self, document_path: Path):
+        for collection_id in self.children.pop(document_path, ()):
+            path = (*document_path, collection_id)
+            self._loaded(path)
+            self.indexes.pop(path, None)
+            self.sorted_ids.pop(path, None)
+            self.groups[collection_id].pop(path, None)
+            self._shared.discard(path)
+            self._bump(path)
+            self.times.pop(path, None)
+            collection = self.collections.pop(path, {})
+            for doc_id in collection:
+                self.document_versions.pop((*path, doc_id), None)
+                self._unregister_subcollections((*path, doc_id))
+            self._notify(
+                path,
+                [(doc_id, document, None) for doc_id, document in collection.items()],
+            )
+
+    def add_listener(self, listener: Listener, key: Path | str):
+        """
+        Registers `listener` for writes to the collection or document at `key`,
+        or to every collection with the ID `key` if it is a string.
+        """
+        with self._registry_lock:
+            registry = self.group_listeners if isinstance(key, str) else self.listeners
+            registry[key] = (*registry.get(key, ()), listener)
+
+    def remove_listener(self, listener: Listener, key: Path | str):
+        with self._registry_lock:
+            registry = self.group_listeners if isinstance(key, str) else self.listeners
+            listeners = tuple(
+                registered
+                for registered in registry.get(key, ())
+                if registered is not listener
+            )
+            if listeners:
+                registry[key] = listeners
+            else:
+                registry.pop(key, None)
+
+    def _notify(self, collection_path: Path, changes: list[Change]):
+        """Tells the listeners of a collection, and of its documents, about writes."""
+        if not (self.listeners or self.group_listeners) or not changes:
+            return
+        listeners = [
+            *self.listeners.get(collection_path, ()),
+            *self.group_listeners.get(collection_path[-1], ()),
+        ]
+        for doc_id, _, _ in changes:
+            listeners.extend(self.listeners.get((*collection_path, doc_id), ()))
+        pending = getattr(self._local, "pending", None)
+        for listener in listeners:
+            if listener.on_changes(collection_path, changes) and pending is not None:
+                pending[listener] = None
+
+    def _add_id(self, collection_path: Path, doc_id: str):
+        ids = self.sorted_ids.get(collection_path)
+        if ids is None:
+            ids = self.sorted_ids.setdefault(collection_path, SortedIds())
+        ids.add(doc_id)
+
+    def version(self, path: Sequence[str]) -> int:
+        """A stamp that changes on every write to the collection at `path`."""
+        return self.versions.get(tuple(path), 0)
+
+    def group_version(self, collection_id: str) -> int:
+        """A stamp that changes on every write to a collection named `collection_id`."""
+        return self.group_versions.get(collection_id, 0)
+
+    def document_version(self, path: Sequence[str]) -> int:
+        """The stamp of the last write to the document at `path`, 0 if it is missing."""
+        version = self.document_versions.get(tuple(path))
+        if version is None:
+            return self._base_version if self.has_document(path) else 0
+        return version
+
+    def read_version(self, path: Sequence[str], document: Document) -> int | None:
+        """
+        The version of the document at `path` if `document`, as read from the
+        store, is still the one stored there, else None. Both are looked up under
+        the collection's read lock, so the version is that of `document`.
+        """
+        with self.reading(path[:-1]):
+            stored = self.collection(path[:-1]).get(path[-1])
+            # Stored documents are replaced, never modified, on writes.
+            if stored is document or not (stored or document):
+                return self.document_version(path)
+        return None
+
+    def document_times(self, path: Sequence[str]) -> DocumentTimes | None:
+        """The times of the document at `path`, or None if it does not exist."""
+        times = self.times.get(tuple(path[:-1]))
+        if times is None:
+            times = self.collection_times(path[:-1])
+        return times.get(path[-1])
+
+    def collection_times(self, path: Sequence[str]) -> Times:
+        """
+        The times of the documents of the collection at `path`, which must not be
+        modified. Read them before the documents: a write replaces a document
+        before its times, so a document read after its times is never older than
+        they are.
+        """
+        path = tuple(path)
+        self._loaded(path)
+        return self.times.get(path, {})
+
+    def last_commit_time(self) -> Timestamp:
+        """The time of the latest commit; no commit is timed at or before it."""
+        return Timestamp.from_nanoseconds(self._last_commit)
+
+    def advance_commit_time(self, commit_time: Timestamp):
+        """Times later commits after `commit_time`, as when restoring a store."""
+        with self._commit_lock:
+            self._last_commit = max(self._last_commit, commit_time.ToNanoseconds())
+
+    def _commit_time(self, commit_time: Timestamp | None = None) -> Timestamp:
+        """
+        The time of a new commit: `commit_time` if given, otherwise now, or just
+        after the previous commit if the system clock has not moved past it, so
+        that the documents written by later commits are always updated later.
+        """
+        if commit_time is not None:
+            self.advance_commit_time(commit_time)
+            return commit_time
+        with self._commit_lock:
+            now = self._last_commit = max(time.time_ns(), self._last_commit + 1)
+        return Timestamp.from_nanoseconds(now)
+
+    def _stamp(self, document_path: Path):
+        self.document_versions[document_path] = next(self._clock)
+
+    def _bump(self, path: Path):
+        stamp = next(self._clock)
+        self.versions[path] = stamp
+        self.group_versions[path[-1]] = stamp
+
+    def prune_references(self):
+        """Drops the interned references that are no longer used."""
+        with self._registry_lock:
+            self.references = {
+                key: interned
+                for key, interned in list(self.references.items())
+                if interned() is not None
+            }
+            self.references_limit = max(2 * len(self.references), _MIN_REFERENCES_LIMIT)
+
+    def define_index(self, collection_id: str, fields: Sequence[tuple[str, str]]):
+        fields = tuple((field_path, direction) for field_path, direction in fields)
+        for _, direction in fields:
+            if direction not in DIRECTIONS:
+                raise ValueError(f"Invalid index direction: {direction!r}")
+        with self._registry_lock:
+            definitions = self.index_definitions.get(collection_id, [])
+            if fields not in definitions:
+                # Replaced rather than appended to, as queries may be reading it.
+                self.index_definitions[collection_id] = [*definitions, fields]
+
+    def collection_index(self, path: Sequence[str]) -> CollectionIndex:
+        path = tuple(path)
+        index = self.indexes.get(path)
+        if index is None:
+            index = self.indexes.setdefault(path, CollectionIndex())
+        return index
+
+
+def _set_times(times: Times, doc_id: str, document: Document, created: DocumentTimes):
+    """
+    Times a write of `document` by a commit, where `created` is the record of the
+    documents the commit creates, which they share. An existing document keeps its
+    create time, and an empty one does not exist, so it has no times.
+    """
+    if not document:
+        times.pop(doc_id, None)
+        return
+    previous = times.get(doc_id)
+    if previous is None:
+        times[doc_id] = created
+    else:
+        times[doc_id] = DocumentTimes(previous.create_time, created.update_time)
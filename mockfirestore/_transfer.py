@@ -0,0 +1,197 @@
+import itertools
+import json
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from typing import IO, Any
+
+from mockfirestore._codec import TYPE_KEY, Encoder, decode, dumps_line
+from mockfirestore._helpers import Document
+from mockfirestore._index import CollectionIndex
+from mockfirestore._store import Path, Store
+
+IMPORT_BATCH_SIZE = 10_000
+# Exported lines are written to files in chunks of about this many characters.
+EXPORT_CHUNK_SIZE = 1 << 20
+
+# A path to an NDJSON file, an open file, or an iterable of lines or of records.
+Source = str | IO | Iterable[str | bytes | dict]
+Record = tuple[list[str], Document]
+
+
+def read_batches(
+    source: Source, reference: Callable[[list[str]], Any], batch_size: int
+) -> Iterator[list[Record]]:
+    """
+    The `(path, document)` of each `{"path": ..., "data": ...}` record of
+    `source`, in batches of up to `batch_size`. The lines of a batch are parsed
+    at once, and only decoded if one of them has tagged values. Parsed records
+    are always decoded, which also copies their data.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from read_batches(f, reference, batch_size)
+        return
+
+    source = iter(source)
+    while True:
+        items = list(itertools.islice(source, batch_size))
+        if not items:
+            return
+        lines = [
+            item.decode() if isinstance(item, bytes) else item
+            for item in items
+            if not isinstance(item, dict)
+        ]
+        if len(lines) == len(items):
+            text = ",".join(line for line in lines if line.strip())
+            records = _parse(f"[{text}]", lines)
+            tagged = TYPE_KEY in text
+        else:
+            records = [
+                item if isinstance(item, dict) else _parse(item, [item])
+                for item in items
+                if isinstance(item, dict) or item.strip()
+            ]
+            tagged = True
+        try:
+            if tagged:
+                yield [
+                    (record["path"].split("/"), decode(record["data"], reference))
+                    for record in records
+                ]
+            else:
+                yield [
+                    (record["path"].split("/"), record["data"]) for record in records
+                ]
+        except (KeyError, TypeError, AttributeError) as error:
+            raise ValueError(f"Invalid record: {_invalid(records)}") from error
+
+
+def _parse(text: str, lines: list[str]) -> Any:
+    try:
+        return json.loads(text)
+    except ValueError:
+        for line in lines:
+            try:
+                json.loads(line)
+            except ValueError as error:
+                raise ValueError(f"Invalid record: {line[:200]!r}") from error
+        raise
+
+
+def _invalid(records: list) -> str:
+    """The first record that is not an object with a string path and data."""
+    for record in records:
+        if not (
+            isinstance(record, dict)
+            and isinstance(record.get("path"), str)
+            and "data" in record
+        ):
+            return repr(record)[:200]
+    return "?"
+
+
+def import_documents(store: Store, batches: Iterable[list[Record]]) -> int:
+    """
+    Writes batches of `(path, document)` records, holding one batch at a time.
+    The parent documents of each collection are created once, when the collection
+    is first met, and its indexes are dropped while it is written to, then rebuilt
+    once at the end. Returns how many documents were written.
+    """
+    seen: set[Path] = set()
+    # The indexes of the collections written to, as they were before.
+    indexed: dict[Path, CollectionIndex] = {}
+    count = 0
+    for batch in batches:
+        for path, _ in batch:
+            collection_path = tuple(path[:-1])
+            if collection_path in seen:
+                continue
+            if len(path) % 2:
+                raise ValueError(f"Not a document path: {'/'.join(path)}")
+            seen.add(collection_path)
+            for end in range(2, len(collection_path), 2):
+                store.ensure_document(collection_path[:end])
+            index = store.indexes.get(collection_path)
+            if index is not None:
+                indexed[collection_path] = index
+        store.apply_writes(batch, bulk=True)
+        count += len(batch)
+
+    for collection_path, index in indexed.items():
+        with store.reading(collection_path):
+            documents = store.collection(collection_path)
+            rebuilt = store.collection_index(collection_path)
+            for field_path in index.fields:
+                rebuilt.field(field_path, documents)
+            for fields in index.composites:
+                rebuilt.composite(fields, documents)
+    return count
+
+
+def export_lines(store: Store, prefix: Sequence[str] = ()) -> Iterator[str]:
+    """
+    An NDJSON `{"path": ..., "data": ...}` line for each document whose path
+    starts with the segments of `prefix`, placeholders included, collection by
+    collection and in ID order. Collections are read as the export reaches them,
+    and nothing is copied: each document is encoded as it is yielded.
+    """
+    prefix = tuple(prefix)
+    for collection_path in store.collection_paths():
+        if collection_path[: len(prefix)] == prefix:
+            doc_ids = store.document_ids(collection_path)
+        elif collection_path == prefix[:-1]:
+            doc_ids = [prefix[-1]]
+        else:
+            continue
+        name = "/".join(collection_path)
+        for doc_id in doc_ids:
+            document = store.collection(collection_path).get(doc_id)
+            if document is not None:
+                yield encode_record(f"{name}/{doc_id}", document)
+
+
+def encode_record(path: str, document: Document) -> str:
+    """
+    The NDJSON line of a document. Documents that JSON holds as they are, and
+    that have no map a reader would take for a tagged value, skip the encoder.
+    """
+    try:
+        line = dumps_line({"path": path, "data": document})
+        if TYPE_KEY not in line:
+            return line
+    except TypeError:
+        pass
+    return dumps_line({"path": path, "data": Encoder().encode(document)})
+
+
+def write_lines(lines: Iterable[str], file: IO, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Writes `lines` to a text or binary file in chunks of about `chunk_size`
+    characters. Returns how many lines were written.
+    """
+    count = 0
+    binary = None
+    chunk: list[str] = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        count += 1
+        if size >= chunk_size:
+            binary = _write(file, "".join(chunk), binary)
+            chunk, size = [], 0
+    if chunk:
+        _write(file, "".join(chunk), binary)
+    return count
+
+
+def _write(file: IO, text: str, binary: bool | None) -> bool:
+    """Writes `text`, encoded if the file is binary. Returns whether it is."""
+    if binary is None:
+        try:
+            file.write(text)
+            return False
+        except TypeError:
+            binary = True
+    file.write(text.encode() if binary else text)
+    return binary
@@ -0,0 +1,98 @@
+from collections.abc import AsyncIterator, Iterable, Iterator
+from typing import Any
+
+from mockfirestore._helpers import Document, Timestamp
+from mockfirestore._index import get_field_value
+
+
+class AggregationResult:
+    """The value of one aggregation, under its alias."""
+
+    def __init__(self, alias: str, value: Any, read_time: Timestamp | None = None):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+    def __repr__(self):
+        return f"<AggregationResult alias={self.alias!r} value={self.value!r}>"
+
+
+class AggregationQuery:
+    """
+    Counts, sums or averages the documents of a query. Mirrors
+    `google.cloud.firestore_v1.aggregation.AggregationQuery`: results come as one
+    list of `AggregationResult`s, in the order the aggregations were added.
+    Aggregations without an alias are named `field_1`, `field_2` and so on.
+    """
+
+    def __init__(self, nested_query: "Query") -> None:  # ruff: noqa: F821
+        self._nested_query = nested_query
+        # (kind, alias, field path)
+        self._aggregations: list[tuple[str, str | None, str | None]] = []
+
+    def count(self, alias: str | None = None) -> "AggregationQuery":
+        self._aggregations.append(("count", alias, None))
+        return self
+
+    def sum(self, field_ref: str, alias: str | None = None) -> "AggregationQuery":
+        self._aggregations.append(("sum", alias, field_ref))
+        return self
+
+    def avg(self, field_ref: str, alias: str | None = None) -> "AggregationQuery":
+        self._aggregations.append(("avg", alias, field_ref))
+        return self
+
+    def get(self, transaction=None) -> list[list[AggregationResult]]:
+        return list(self.stream(transaction))
+
+    def stream(self, transaction=None) -> Iterator[list[AggregationResult]]:
+        yield self._aggregate(self._nested_query._aggregated_documents())
+
+    def _aggregate(self, documents: Iterable[Document]) -> list[AggregationResult]:
+        """Computes every aggregation in a single pass over `documents`."""
+        paths = [
+            None if field_path is None else field_path.split(".")
+            for _, _, field_path in self._aggregations
+        ]
+        count = 0
+        totals = [0] * len(self._aggregations)
+        counts = [0] * len(self._aggregations)
+        for document in documents:
+            count += 1
+            for position, path in enumerate(paths):
+                if path is None:
+                    continue
+                value = get_field_value(document, path)
+                if not _is_number(value):
+                    continue
+                totals[position] += value
+                counts[position] += 1
+
+        read_time = Timestamp.from_now()
+        results = []
+        unnamed = 0
+        for (kind, alias, _), total, numbers in zip(self._aggregations, totals, counts):
+            if alias is None:
+                unnamed += 1
+                alias = f"field_{unnamed}"
+            if kind == "count":
+                value = count
+            elif kind == "sum":
+                value = total
+            else:
+                value = total / numbers if numbers else None
+            results.append(AggregationResult(alias, value, read_time))
+        return results
+
+
+class AsyncAggregationQuery(AggregationQuery):
+    async def get(self, transaction=None) -> list[list[AggregationResult]]:
+        return [results async for results in self.stream(transaction)]
+
+    async def stream(self, transaction=None) -> AsyncIterator[list[AggregationResult]]:
+        yield self._aggregate(self._nested_query._aggregated_documents())
+
+
+def _is_number(value: Any) -> bool:
+    """Only numbers are summed and averaged; booleans are not numbers."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
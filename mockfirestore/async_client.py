@@ -2,12 +2,16 @@ from collections.abc import AsyncIterable, Iterable
 
 from mockfirestore.async_collection import AsyncCollectionReference
 from mockfirestore.async_document import AsyncDocumentReference
+from mockfirestore.async_query import AsyncQuery
 from mockfirestore.async_transaction import AsyncTransaction
+from mockfirestore.batch import AsyncWriteBatch
 from mockfirestore.client import MockFirestore
 from mockfirestore.document import DocumentSnapshot
 
 
 class AsyncMockFirestore(MockFirestore):
+    _collection_type = AsyncCollectionReference
+
     def document(self, path: str) -> AsyncDocumentReference:
         doc = super().document(path)
         assert isinstance(doc, AsyncDocumentReference)
@@ -24,22 +28,33 @@ class AsyncMockFirestore(MockFirestore):
             current_position = self._ensure_path(path)
             return current_position.collection(name)
         else:
-            if name not in self._data:
-                self._data[name] = {}
+            self._data.ensure_collection([name])
             return AsyncCollectionReference(self._data, [name])
 
+    def collection_group(self, collection_id: str) -> AsyncQuery:
+        query = super().collection_group(collection_id)
+        return AsyncQuery(
+            AsyncCollectionReference(self._data, query.parent._path),
+            all_descendants=True,
+        )
+
     async def collections(self) -> AsyncIterable[AsyncCollectionReference]:
-        for collection_name in self._data:
+        for collection_name in self._data.collection_ids():
             yield AsyncCollectionReference(self._data, [collection_name])
 
     async def get_all(
         self,
         references: Iterable[AsyncDocumentReference],
-        field_paths=None,
+        field_paths: Iterable[str] | None = None,
         transaction=None,
     ) -> AsyncIterable[DocumentSnapshot]:
-        for doc_ref in set(references):
-            yield await doc_ref.get()
+        if field_paths is not None:
+            field_paths = list(field_paths)
+        for doc_ref in dict.fromkeys(references):
+            yield await doc_ref.get(field_paths)
 
     def transaction(self, **kwargs) -> AsyncTransaction:
         return AsyncTransaction(self, **kwargs)
+
+    def batch(self) -> AsyncWriteBatch:
+        return AsyncWriteBatch(self)
@@ -1,18 +1,26 @@
+import asyncio
 from collections.abc import AsyncIterator
 from typing import Any
 
-from mockfirestore._helpers import Timestamp, get_by_path
+from mockfirestore._helpers import Timestamp
+from mockfirestore.aggregation import AsyncAggregationQuery
 from mockfirestore.async_document import AsyncDocumentReference
-from mockfirestore.async_query import AsyncQuery
+from mockfirestore.async_query import YIELD_EVERY, AsyncQuery
 from mockfirestore.collection import CollectionReference
 from mockfirestore.document import DocumentReference, DocumentSnapshot
 
 
 class AsyncCollectionReference(CollectionReference):
+    __slots__ = ()
+
     def document(self, document_id: str | None = None) -> AsyncDocumentReference:
         doc_ref = super().document(document_id)
-        return AsyncDocumentReference(
-            doc_ref._data, doc_ref._path, parent=doc_ref.parent
+        assert isinstance(doc_ref, AsyncDocumentReference)
+        return doc_ref
+
+    def _reference(self, document_id: str) -> AsyncDocumentReference:
+        return AsyncDocumentReference._interned(
+            self._data, (*self._key, document_id), self
         )
 
     async def get(self, transaction=None) -> list[DocumentSnapshot]:
@@ -38,9 +46,13 @@ class AsyncCollectionReference(CollectionReference):
             yield doc
 
     async def stream(self, transaction=None) -> AsyncIterator[DocumentSnapshot]:
-        for key in sorted(get_by_path(self._data, self._path)):
-            doc_snapshot = await self.document(key).get()
-            yield doc_snapshot
+        times = self._data.collection_times(self._path)
+        documents = self._data.collection(self._path)
+        for position, key in enumerate(self._data.document_ids(self._path), 1):
+            doc_times = times.get(key)
+            yield DocumentSnapshot._of(self, key, documents.get(key, {}), doc_times)
+            if position % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
 
     def where(
         self,
@@ -77,6 +89,15 @@ class AsyncCollectionReference(CollectionReference):
 
         return AsyncQuery(self, field_filters=[(field, op, value)])
 
+    def count(self, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncQuery(self).avg(field_ref, alias)
+
     def order_by(self, key: str, direction: str | None = None) -> AsyncQuery:
         query = AsyncQuery(self, orders=[(key, direction)])
         return query
@@ -85,6 +106,10 @@ class AsyncCollectionReference(CollectionReference):
         query = AsyncQuery(self, limit=limit_amount)
         return query
 
+    def limit_to_last(self, count: int) -> AsyncQuery:
+        query = AsyncQuery(self, limit=count, limit_to_last=True)
+        return query
+
     def offset(self, offset: int) -> AsyncQuery:
         query = AsyncQuery(self, offset=offset)
         return query
@@ -1,25 +1,22 @@
-from copy import deepcopy
+from collections.abc import Iterable
 from typing import Any
 
-from mockfirestore import NotFound
 from mockfirestore.document import DocumentReference, DocumentSnapshot
 
 
 class AsyncDocumentReference(DocumentReference):
-    async def get(self, transaction=None) -> DocumentSnapshot:
-        return super().get(transaction)
+    __slots__ = ()
+
+    async def get(
+        self, field_paths: Iterable[str] | None = None, transaction=None
+    ) -> DocumentSnapshot:
+        return super().get(field_paths, transaction)
 
     async def delete(self):
         super().delete()
 
     async def set(self, data: dict[str, Any], merge=False):
-        if merge:
-            try:
-                await self.update(deepcopy(data))
-            except NotFound:
-                await self.set(data)
-        else:
-            super().set(data, merge=merge)
+        super().set(data, merge=merge)
 
     async def update(self, data: dict[str, Any]):
         super().update(data)
@@ -1,9 +1,23 @@
-from collections.abc import AsyncIterator
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from itertools import chain, islice
 from typing import Any
 
 from mockfirestore._helpers import consume_async_iterable
+from mockfirestore._predicate import compile_filters
+from mockfirestore.aggregation import AsyncAggregationQuery
 from mockfirestore.document import DocumentSnapshot
-from mockfirestore.query import Query
+from mockfirestore.query import (
+    Query,
+    QueryExplanation,
+    _after_start,
+    _before_end,
+    _QueryPlan,
+)
+
+# How many documents async queries read before handing control back to the event
+# loop.
+YIELD_EVERY = 1000
 
 
 class AsyncQuery(Query):
@@ -18,6 +32,7 @@ class AsyncQuery(Query):
         start_at=None,
         end_at=None,
         all_descendants=False,
+        limit_to_last=False,
     ) -> None:
         super().__init__(
             parent=parent,
@@ -29,18 +44,101 @@ class AsyncQuery(Query):
             start_at=start_at,
             end_at=end_at,
             all_descendants=all_descendants,
+            limit_to_last=limit_to_last,
         )
 
     async def stream(self, transaction=None) -> AsyncIterator[DocumentSnapshot]:
-        doc_snapshots = await consume_async_iterable(self.parent.stream())
-        doc_snapshots = super()._process_field_filters(doc_snapshots)
-        doc_snapshots = super()._process_pagination(doc_snapshots)
+        slot = self._cache_slot()
+        if slot is None:
+            async for doc_snapshot in self._stream(self._plan()):
+                yield doc_snapshot
+            return
+
+        doc_snapshots = self._cached(slot)
+        if doc_snapshots is None:
+            doc_snapshots = self._cache(
+                slot,
+                [doc_snapshot async for doc_snapshot in self._stream(self._plan())],
+            )
         for doc_snapshot in doc_snapshots:
             yield doc_snapshot
 
+    async def _stream(self, plan: _QueryPlan) -> AsyncIterator[DocumentSnapshot]:
+        """
+        Runs `plan` without holding the event loop for more than `YIELD_EVERY`
+        documents at a time. Results that are read in query order are yielded as
+        they are found, and reading stops once the limit is reached; the others
+        are sorted once every match has been read.
+        """
+        ordered = plan.ordered or not (self.orders or self.all_descendants)
+        if self._limit_to_last or not ordered:
+            doc_snapshots = [
+                doc_snapshot
+                async for chunk in self._chunks(plan)
+                for doc_snapshot in chunk
+            ]
+            for doc_snapshot in self._process_pagination(
+                iter(doc_snapshots), plan.ordered, plan.cursors_applied
+            ):
+                yield doc_snapshot
+            return
+
+        start, end = (None, None) if plan.cursors_applied else self._cursors()
+        offset, limit = self._offset or 0, self._limit
+        async for chunk in self._chunks(plan):
+            if start or end:
+                keyed_snapshots = self._keyed_by_order(chunk)
+            else:
+                keyed_snapshots = ((None, doc_snapshot) for doc_snapshot in chunk)
+            for key, doc_snapshot in keyed_snapshots:
+                if key is not None:
+                    if not _after_start(key, start):
+                        continue
+                    if not _before_end(key, end):
+                        return
+                if offset:
+                    offset -= 1
+                    continue
+                yield doc_snapshot
+                if limit:
+                    limit -= 1
+                    if not limit:
+                        return
+
+    async def _chunks(
+        self, plan: _QueryPlan
+    ) -> AsyncIterator[Iterator[DocumentSnapshot]]:
+        """
+        The documents read by `plan` that pass the query's filters, in chunks of
+        at most `YIELD_EVERY` documents read, with a pause for the event loop after
+        each chunk. Chunks are read lazily, so a caller that stops reading one
+        stops the scan where it is; it must not skip to the next chunk.
+        """
+        scanned = self._scanned(plan)
+        predicate = compile_filters(self._field_filters)
+        for doc_snapshot in scanned:
+            chunk = chain((doc_snapshot,), islice(scanned, YIELD_EVERY - 1))
+            yield (
+                doc_snapshot for doc_snapshot in chunk if predicate(doc_snapshot._doc)
+            )
+            await asyncio.sleep(0)
+
+    async def explain(self) -> QueryExplanation:
+        plan = self._plan()
+        return plan.explain(len([_ async for _ in self._stream(plan)]))
+
     async def get(self, transaction=None) -> list[DocumentSnapshot]:
         return await consume_async_iterable(self.stream())
 
+    def count(self, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncAggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncAggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str | None = None) -> AsyncAggregationQuery:
+        return AsyncAggregationQuery(self).avg(field_ref, alias)
+
     def where(
         self,
         field: str | None = None,
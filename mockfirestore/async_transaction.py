@@ -1,8 +1,15 @@
-from collections.abc import AsyncIterable, Iterable
+from collections.abc import AsyncIterable, Callable, Iterable
+from typing import Any
 
+from mockfirestore import Aborted
 from mockfirestore.async_document import AsyncDocumentReference
 from mockfirestore.document import DocumentSnapshot
-from mockfirestore.transaction import _CANT_COMMIT, Transaction, WriteResult
+from mockfirestore.transaction import (
+    _EXCEED_ATTEMPTS_TEMPLATE,
+    Transaction,
+    WriteResult,
+    _Transactional,
+)
 
 
 class AsyncTransaction(Transaction):
@@ -13,27 +20,18 @@ class AsyncTransaction(Transaction):
         super()._rollback()
 
     async def _commit(self) -> Iterable[WriteResult]:
-        if not self.in_progress:
-            raise ValueError(_CANT_COMMIT)
-
-        results = []
-        for write_op in self._write_ops:
-            await write_op()
-            results.append(WriteResult())
-        self.write_results = results
-        self._clean_up()
-        return results
+        return super()._commit()
 
     async def get(self, ref_or_query) -> AsyncIterable[DocumentSnapshot]:
-        doc_snapshots = super().get(ref_or_query)
-        async for doc_snapshot in doc_snapshots:
+        async for doc_snapshot in self._source(ref_or_query):
+            self._record_read(doc_snapshot)
             yield doc_snapshot
 
     async def get_all(
         self, references: Iterable[AsyncDocumentReference]
     ) -> AsyncIterable[DocumentSnapshot]:
-        doc_snapshots = super().get_all(references)
-        async for doc_snapshot in doc_snapshots:
+        async for doc_snapshot in self._client.get_all(references):
+            self._record_read(doc_snapshot)
             yield doc_snapshot
 
     async def __aenter__(self):
@@ -42,3 +40,28 @@ class AsyncTransaction(Transaction):
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None:
             await self.commit()
+
+
+class _AsyncTransactional(_Transactional):
+    async def __call__(self, transaction: AsyncTransaction, *args, **kwargs) -> Any:
+        for _ in range(transaction._max_attempts):
+            await transaction._begin()
+            try:
+                result = await self.to_wrap(transaction, *args, **kwargs)
+                await transaction._commit()
+                return result
+            except Aborted:
+                # Raised by the commit or by the function itself: either way, the
+                # next attempt starts with no reads or writes.
+                transaction._clean_up()
+                continue
+            except BaseException:
+                if transaction.in_progress:
+                    await transaction._rollback()
+                raise
+        raise ValueError(_EXCEED_ATTEMPTS_TEMPLATE.format(transaction._max_attempts))
+
+
+def async_transactional(to_wrap: Callable) -> _AsyncTransactional:
+    """Makes the coroutine `to_wrap` run in the transaction passed to it first."""
+    return _AsyncTransactional(to_wrap)
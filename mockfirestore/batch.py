@@ -0,0 +1,210 @@
+from collections.abc import Callable
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any
+
+from mockfirestore import AlreadyExists, ClientError, NotFound
+from mockfirestore._helpers import Document, Timestamp
+from mockfirestore._store import Path, Store
+from mockfirestore.document import DocumentReference, updated_document
+
+# (reference, "create" | "set" | "merge" | "update" | "delete", data)
+Write = tuple[DocumentReference, str, Any]
+
+
+class WriteResult:
+    def __init__(self, update_time: Timestamp | None = None):
+        self.update_time = update_time or Timestamp.from_now()
+
+
+class _Writes:
+    """Document writes, queued until they are applied."""
+
+    def __init__(self, client) -> None:
+        self._client = client
+        self._writes: list[Write] = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def _add_write(self, reference: DocumentReference, op: str, data: Any = None):
+        self._writes.append((reference, op, data))
+
+    def create(self, reference: DocumentReference, document_data: dict):
+        self._add_write(reference, "create", document_data)
+
+    def set(self, reference: DocumentReference, document_data: dict, merge=False):
+        self._add_write(reference, "merge" if merge else "set", document_data)
+
+    def update(self, reference: DocumentReference, field_updates: dict, option=None):
+        self._add_write(reference, "update", field_updates)
+
+    def delete(self, reference: DocumentReference, option=None):
+        self._add_write(reference, "delete")
+
+
+class WriteBatch(_Writes):
+    """
+    Writes committed together: either all of them are applied or, if one fails,
+    none is. They are applied in one pass, grouped by collection, so indexes,
+    sorted IDs and query cache versions are updated once per collection.
+    """
+
+    def __init__(self, client) -> None:
+        super().__init__(client)
+        self.write_results: list[WriteResult] | None = None
+        self.commit_time: Timestamp | None = None
+
+    def commit(self, retry=None, timeout=None) -> list[WriteResult]:
+        self.write_results = commit_writes(self._client._data, self._writes)
+        if self.write_results:
+            self.commit_time = self.write_results[0].update_time
+        self._writes = []
+        return self.write_results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+
+
+class AsyncWriteBatch(WriteBatch):
+    async def commit(self, retry=None, timeout=None) -> list[WriteResult]:
+        return super().commit(retry, timeout)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.commit()
+
+
+@dataclass
+class BulkWriteFailure:
+    """A write of a `BulkWriter` that failed, and why."""
+
+    reference: DocumentReference
+    operation: str
+    code: int | None
+    message: str
+    attempts: int = 1
+
+
+class BulkWriter(_Writes):
+    """
+    Writes applied in bulk on `flush()` or `close()`. Unlike a `WriteBatch`, each
+    write succeeds or fails on its own; failures are reported to the
+    `on_write_error` callback rather than raised. A write that fails here fails
+    the same way every time, so it is not retried.
+    """
+
+    def __init__(self, client) -> None:
+        super().__init__(client)
+        self._closed = False
+        self._on_write_result: Callable | None = None
+        self._on_write_error: Callable | None = None
+
+    def _add_write(self, reference: DocumentReference, op: str, data: Any = None):
+        if self._closed:
+            raise ValueError("Cannot write with a closed BulkWriter.")
+        super()._add_write(reference, op, data)
+
+    def on_write_result(
+        self, callback: Callable[[DocumentReference, WriteResult, "BulkWriter"], None]
+    ):
+        self._on_write_result = callback
+
+    def on_write_error(
+        self, callback: Callable[[BulkWriteFailure, "BulkWriter"], bool]
+    ):
+        self._on_write_error = callback
+
+    def flush(self):
+        store: Store = self._client._data
+        staged: dict[Path, Document | None] = {}
+        writes, written, failures = [], [], []
+        pending, self._writes = self._writes, []
+        # Writes are resolved while their collections are locked, so none is made
+        # against a document that another thread changes before it is applied.
+        with store.writing(reference._path[:-1] for reference, _, _ in pending):
+            for reference, op, data in pending:
+                path = tuple(reference._path)
+                try:
+                    document = _staged_write(store, staged, path, op, data)
+                except ClientError as error:
+                    failures.append(
+                        BulkWriteFailure(
+                            reference,
+                            op,
+                            error.code,
+                            getattr(error, "message", str(error)),
+                        )
+                    )
+                    continue
+                writes.append((path, document))
+                written.append(reference)
+            commit_time = store.apply_writes(writes)
+
+        if self._on_write_error is not None:
+            for failure in failures:
+                self._on_write_error(failure, self)
+        if self._on_write_result is not None:
+            result = WriteResult(commit_time)
+            for reference in written:
+                self._on_write_result(reference, result, self)
+
+    def close(self):
+        self.flush()
+        self._closed = True
+
+
+def commit_writes(store: Store, writes: list[Write]) -> list[WriteResult]:
+    """
+    Applies `writes` atomically: every write is resolved against the store and the
+    earlier writes before any is applied, so a failing one leaves the store as it
+    was.
+    """
+    staged: dict[Path, Document | None] = {}
+    documents = []
+    # The collections written to stay locked from the first read to the last
+    # write, so no other thread's write can come in between and be overwritten.
+    with store.writing(reference._path[:-1] for reference, _, _ in writes):
+        for reference, op, data in writes:
+            path = tuple(reference._path)
+            documents.append((path, _staged_write(store, staged, path, op, data)))
+        commit_time = store.apply_writes(documents)
+    return [WriteResult(commit_time) for _ in documents]
+
+
+def _staged_write(
+    store: Store,
+    staged: dict[Path, Document | None],
+    path: Path,
+    op: str,
+    data: Any,
+) -> Document | None:
+    """
+    The document that `op` leaves at `path`, or None for a delete, reading
+    earlier writes of the same batch from `staged` and recording this one there.
+    """
+    document = staged[path] if path in staged else store.get_document(path)
+    exists = bool(document)
+    if op == "create":
+        if exists:
+            raise AlreadyExists(f"Document already exists: {list(path)}")
+        document = deepcopy(data)
+    elif op == "set":
+        document = deepcopy(data)
+    elif op == "merge":
+        document = updated_document(document, data) if exists else deepcopy(data)
+    elif op == "update":
+        if not exists:
+            raise NotFound(f"No document to update: {list(path)}")
+        document = updated_document(document, data)
+    else:
+        document = None
+    staged[path] = document
+    return document
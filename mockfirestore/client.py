@@ -1,14 +1,29 @@
+import functools
+import json
 from collections.abc import Iterable, Sequence
+from typing import IO
 
+from mockfirestore import _snapshot, _transfer
+from mockfirestore._cache import DEFAULT_MAX_BYTES, QueryCache, QueryCacheStats
+from mockfirestore._journal import (
+    DEFAULT_SYNC_EVERY,
+    DEFAULT_SYNC_INTERVAL,
+    Journal,
+    read_journal,
+)
+from mockfirestore._store import Store
+from mockfirestore.batch import BulkWriter, WriteBatch
 from mockfirestore.collection import CollectionReference
 from mockfirestore.document import DocumentReference, DocumentSnapshot
+from mockfirestore.query import Query
 from mockfirestore.transaction import Transaction
 
 
 class MockFirestore:
+    _collection_type = CollectionReference
 
     def __init__(self) -> None:
-        self._data = {}
+        self._data = Store()
 
     def _ensure_path(self, path):
         current_position = self
@@ -41,27 +56,233 @@ class MockFirestore:
             current_position = self._ensure_path(path)
             return current_position.collection(name)
         else:
-            if name not in self._data:
-                self._data[name] = {}
+            self._data.ensure_collection([name])
             return CollectionReference(self._data, [name])
 
+    def collection_group(self, collection_id: str) -> Query:
+        """
+        Queries the documents of every collection whose ID is `collection_id`,
+        wherever it is nested.
+        """
+        if "/" in collection_id:
+            raise ValueError(
+                f"Invalid collection_id {collection_id!r}. Collection IDs must not "
+                "contain '/'."
+            )
+        return Query(
+            CollectionReference(self._data, [collection_id]), all_descendants=True
+        )
+
     def collections(self) -> Sequence[CollectionReference]:
         return [
             CollectionReference(self._data, [collection_name])
-            for collection_name in self._data
+            for collection_name in self._data.collection_ids()
         ]
 
     def reset(self):
-        self._data = {}
+        index_definitions = self._data.index_definitions
+        self._replace_store(Store())
+        self._data.index_definitions = index_definitions
+        if self._data.journal is not None:
+            self._data.journal.reset()
+
+    def import_documents(
+        self,
+        source: _transfer.Source,
+        batch_size: int = _transfer.IMPORT_BATCH_SIZE,
+    ) -> int:
+        """
+        Writes the documents of `{"path": ..., "data": ...}` records, such as
+        those of `export_documents`, read from an NDJSON file path, an open file
+        or an iterable of lines or of parsed records. Records are streamed and
+        written in batches of `batch_size`, each collection's path is created
+        once, and indexes are rebuilt once at the end. Returns how many documents
+        were written.
+        """
+        batches = _transfer.read_batches(
+            source, functools.partial(self._reference, self._data), batch_size
+        )
+        return _transfer.import_documents(self._data, batches)
+
+    def export_documents(self, prefix: str | None = None, file: IO | None = None):
+        """
+        Every document whose path starts with `prefix`, or every document, as
+        NDJSON `{"path": ..., "data": ...}` records that `import_documents` reads
+        back. Timestamps, bytes, references and geopoints are tagged. Without
+        `file`, returns a generator of lines, which reads each collection only as
+        it gets to it; otherwise, writes the lines to `file` in large chunks and
+        returns how many were written.
+        """
+        segments = prefix.strip("/").split("/") if prefix else ()
+        lines = _transfer.export_lines(self._data, segments)
+        if file is None:
+            return lines
+        return _transfer.write_lines(lines, file)
+
+    def fork(self) -> "MockFirestore":
+        """
+        A new client holding the same documents and declared indexes. Collections
+        are shared between the two until one of them writes to a collection, which
+        then copies it, so forking a large store is cheap and writes to either
+        client never show in the other. Listeners and the journal are not carried
+        over; the query cache is, empty.
+        """
+        forked = type(self)()
+        forked._data = self._data.fork()
+        return forked
+
+    def save(self, path: str):
+        """
+        Writes every document, and the declared composite indexes, to a binary
+        snapshot file at `path`, to be read back with `load`.
+        """
+        _snapshot.save(self._data, path)
+
+    def load(self, path: str):
+        """
+        Replaces every document, and the declared composite indexes, with those
+        of a snapshot file written by `save` under the same Python version. The
+        file is memory-mapped and each collection is only decoded when first read,
+        so loading a large snapshot costs little more than the collections used.
+        """
+        store = Store()
+        _snapshot.load(store, path, functools.partial(self._reference, store))
+        self._replace_store(store)
+        if self._data.journal is not None:
+            self._data.journal.load(path)
+
+    def _replace_store(self, store: Store):
+        """Swaps in `store`, keeping the journal and the query cache if enabled."""
+        query_cache = self._data.query_cache
+        store.journal = self._data.journal
+        self._data = store
+        if query_cache is not None:
+            self._data.query_cache = QueryCache(query_cache.max_bytes)
+
+    def enable_journal(
+        self,
+        path: str,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        sync_interval: float = DEFAULT_SYNC_INTERVAL,
+    ):
+        """
+        Appends every write, including committed batches and transactions, to the
+        log file at `path`, to be applied again with `replay`. Appends are
+        buffered and synced to disk every `sync_every` records, or `sync_interval`
+        seconds after the first record left unsynced, whichever comes first.
+        Resets and loaded snapshots are logged too; a snapshot is read again from
+        its path on replay.
+        """
+        self.disable_journal()
+        self._data.journal = Journal(path, sync_every, sync_interval)
+
+    def sync_journal(self):
+        """Writes the buffered records of the journal to disk."""
+        if self._data.journal is not None:
+            self._data.journal.sync()
+
+    def disable_journal(self):
+        journal, self._data.journal = self._data.journal, None
+        if journal is not None:
+            journal.close()
+
+    def replay(self, log: str | Iterable[str]):
+        """
+        Applies the records of a journal, given as a path or as its lines, to the
+        documents of the client, usually a new or reset one. Each batch or
+        transaction is applied at once, as it was committed, and timed as it was.
+        Replayed writes are not journaled, so the log can be replayed and then
+        appended to again.
+        """
+        journal, self._data.journal = self._data.journal, None
+        try:
+            records = read_journal(log, lambda path: self._reference(self._data, path))
+            for kind, value in records:
+                if kind == "writes":
+                    writes, commit_time = value
+                    self._data.apply_writes(writes, commit_time=commit_time)
+                elif kind == "collection":
+                    self._data.ensure_collection(value)
+                elif kind == "reset":
+                    self.reset()
+                else:
+                    self.load(value)
+        finally:
+            self._data.journal = journal
+
+    def _reference(self, store: Store, path: Sequence[str]) -> DocumentReference:
+        """A reference to the document at `path` of `store`, without creating it."""
+        collection_type = self._collection_type
+        parent = None
+        if len(path) > 2:
+            parent = collection_type(store, list(path[:-3]))._reference(path[-3])
+        collection = collection_type(store, list(path[:-1]), parent=parent)
+        return collection._reference(path[-1])
+
+    def enable_query_cache(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Caches the results of queries until their collection is written to. Cached
+        results are evicted, least recently used first, to keep them within
+        `max_bytes`.
+        """
+        self._data.query_cache = QueryCache(max_bytes)
+
+    def disable_query_cache(self):
+        self._data.query_cache = None
+
+    def query_cache_stats(self) -> QueryCacheStats | None:
+        """Hit, miss and size counters of the query cache, if it is enabled."""
+        if self._data.query_cache is None:
+            return None
+        return self._data.query_cache.stats()
+
+    def add_index(self, collection_id: str, fields: Sequence[tuple[str, str]]):
+        """
+        Declares a composite index for every collection named `collection_id`.
+        `fields` are `(field_path, direction)` pairs, where direction is either
+        "ASCENDING" or "DESCENDING".
+        """
+        self._data.define_index(collection_id, fields)
+
+    def load_indexes(self, config: str | dict):
+        """
+        Declares the composite indexes of a `firestore.indexes.json` file, given
+        either as a path or as its parsed contents. Array-contains indexes are
+        ignored.
+        """
+        if isinstance(config, str):
+            with open(config) as f:
+                config = json.load(f)
+
+        for index in config.get("indexes", []):
+            if any("order" not in field for field in index["fields"]):
+                continue
+            self.add_index(
+                index["collectionGroup"],
+                [(field["fieldPath"], field["order"]) for field in index["fields"]],
+            )
 
     def get_all(
         self,
         references: Iterable[DocumentReference],
-        field_paths=None,
+        field_paths: Iterable[str] | None = None,
         transaction=None,
     ) -> Iterable[DocumentSnapshot]:
-        for doc_ref in set(references):
-            yield doc_ref.get()
+        """
+        A snapshot of each referenced document, with only the fields at
+        `field_paths` if they are given. References compare by path: each document
+        is read once, in the order it was first asked for.
+        """
+        if field_paths is not None:
+            field_paths = list(field_paths)
+        for doc_ref in dict.fromkeys(references):
+            yield doc_ref.get(field_paths)
 
     def transaction(self, **kwargs) -> Transaction:
         return Transaction(self, **kwargs)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def bulk_writer(self, **kwargs) -> BulkWriter:
+        return BulkWriter(self)
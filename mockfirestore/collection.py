@@ -1,34 +1,25 @@
-from collections.abc import Iterable, Sequence
-from typing import Any
-
-from mockfirestore import AlreadyExists
-from mockfirestore._helpers import (
-    Store,
-    Timestamp,
-    generate_random_string,
-    get_by_path,
-    set_by_path,
-)
+from collections.abc import Callable, Iterable, Sequence
+from typing import IO, Any
+
+from mockfirestore import AlreadyExists, _transfer
+from mockfirestore._helpers import Timestamp, generate_random_string
+from mockfirestore._reference import Reference
+from mockfirestore.aggregation import AggregationQuery
 from mockfirestore.document import DocumentReference, DocumentSnapshot
 from mockfirestore.query import Query
 
 
-class CollectionReference:
-    def __init__(
-        self, data: Store, path: list[str], parent: DocumentReference | None = None
-    ) -> None:
-        self._data = data
-        self._path = path
-        self.parent = parent
+class CollectionReference(Reference):
+    __slots__ = ()
 
     def document(self, document_id: str | None = None) -> DocumentReference:
-        collection = get_by_path(self._data, self._path)
         if document_id is None:
             document_id = generate_random_string()
-        new_path = self._path + [document_id]
-        if document_id not in collection:
-            set_by_path(self._data, new_path, {})
-        return DocumentReference(self._data, new_path, parent=self)
+        self._data.ensure_document(self._path + [document_id])
+        return self._reference(document_id)
+
+    def _reference(self, document_id: str) -> DocumentReference:
+        return DocumentReference._interned(self._data, (*self._key, document_id), self)
 
     def get(self) -> list[DocumentSnapshot]:
         return list(self.stream())
@@ -38,13 +29,14 @@ class CollectionReference:
     ) -> tuple[Timestamp, DocumentReference]:
         if document_id is None:
             document_id = document_data.get("id", generate_random_string())
-        collection = get_by_path(self._data, self._path)
         new_path = self._path + [document_id]
-        if document_id in collection:
-            raise AlreadyExists(f"Document already exists: {new_path}")
         doc_ref = DocumentReference(self._data, new_path, parent=self)
-        doc_ref.set(document_data)
-        timestamp = Timestamp.from_now()
+        with self._data.writing((self._path,)):
+            if self._data.has_document(new_path):
+                raise AlreadyExists(f"Document already exists: {new_path}")
+            doc_ref.set(document_data)
+            times = self._data.document_times(new_path)
+        timestamp = Timestamp.from_now() if times is None else times.update_time
         return timestamp, doc_ref
 
     def where(
@@ -88,6 +80,10 @@ class CollectionReference:
         query = Query(self, limit=limit_amount)
         return query
 
+    def limit_to_last(self, count: int) -> Query:
+        query = Query(self, limit=count, limit_to_last=True)
+        return query
+
     def offset(self, offset: int) -> Query:
         query = Query(self, offset=offset)
         return query
@@ -110,15 +106,38 @@ class CollectionReference:
         query = Query(self, end_at=(document_fields_or_snapshot, False))
         return query
 
+    def count(self, alias: str | None = None) -> AggregationQuery:
+        return Query(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str | None = None) -> AggregationQuery:
+        return Query(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str | None = None) -> AggregationQuery:
+        return Query(self).avg(field_ref, alias)
+
+    def on_snapshot(self, callback: Callable) -> "Watch":  # ruff: noqa: F821
+        return Query(self).on_snapshot(callback)
+
     def list_documents(
         self, page_size: int | None = None
     ) -> Sequence[DocumentReference]:
-        docs = []
-        for key in get_by_path(self._data, self._path):
-            docs.append(self.document(key))
-        return docs
+        with self._data.reading(self._path):
+            keys = list(self._data.collection(self._path))
+        return [self.document(key) for key in keys]
+
+    def export(self, file: IO | None = None):
+        """
+        The documents of the collection and of its subcollections, as NDJSON
+        records; see `MockFirestore.export_documents`.
+        """
+        lines = _transfer.export_lines(self._data, self._path)
+        if file is None:
+            return lines
+        return _transfer.write_lines(lines, file)
 
     def stream(self, transaction=None) -> Iterable[DocumentSnapshot]:
-        for key in sorted(get_by_path(self._data, self._path)):
-            doc_snapshot = self.document(key).get()
-            yield doc_snapshot
+        times = self._data.collection_times(self._path)
+        documents = self._data.collection(self._path)
+        for key in self._data.document_ids(self._path):
+            doc_times = times.get(key)
+            yield DocumentSnapshot._of(self, key, documents.get(key, {}), doc_times)
@@ -1,4 +1,5 @@
 import operator
+from collections.abc import Callable, Iterable
 from copy import deepcopy
 from functools import reduce
 from typing import Any
@@ -6,39 +7,110 @@ from typing import Any
 from mockfirestore import NotFound
 from mockfirestore._helpers import (
     Document,
-    Store,
+    DocumentTimes,
     Timestamp,
-    delete_by_path,
-    get_by_path,
-    set_by_path,
+    copy_paths,
+    project,
 )
+from mockfirestore._reference import Reference
 from mockfirestore._transformations import apply_transformations
 
 
 class DocumentSnapshot:
-    def __init__(self, reference: "DocumentReference", data: Document) -> None:
-        self.reference = reference
-        self._doc = deepcopy(data)
+    """
+    Snapshots share their data with the store, which never modifies a stored
+    document in place. A snapshot only takes its own copy once `to_dict()` hands
+    the data out to the caller. Likewise, it holds the stored record of the
+    document's times, which writes replace rather than modify.
+
+    Snapshots of query results only look up their reference when it is asked for.
+    """
+
+    def __init__(
+        self,
+        reference: "DocumentReference",
+        data: Document,
+        times: DocumentTimes | None = None,
+    ) -> None:
+        self._reference = reference
+        # Set instead of the reference by `_of`.
+        self._collection = None
+        self._id = None
+        self._doc = data
+        self._owns_doc = False
+        self._times = times
+        # Whether the data is only the fields of a field mask.
+        self._masked = False
+
+    @classmethod
+    def _of(
+        cls,
+        collection: "CollectionReference",  # ruff: noqa: F821
+        doc_id: str,
+        data: Document,
+        times: DocumentTimes | None = None,
+    ) -> "DocumentSnapshot":
+        """A snapshot of the document `doc_id` of `collection`."""
+        doc_snapshot = cls.__new__(cls)
+        doc_snapshot._reference = None
+        doc_snapshot._collection = collection
+        doc_snapshot._id = doc_id
+        doc_snapshot._doc = data
+        doc_snapshot._owns_doc = False
+        doc_snapshot._times = times
+        doc_snapshot._masked = False
+        return doc_snapshot
+
+    @property
+    def reference(self) -> "DocumentReference":
+        if self._reference is None and self._collection is not None:
+            self._reference = self._collection._reference(self._id)
+        return self._reference
+
+    @property
+    def _key(self) -> tuple[str, ...]:
+        """The path of the document."""
+        if self._collection is None:
+            return self._reference._key
+        return (*self._collection._key, self._id)
 
     @property
     def id(self):
-        return self.reference.id
+        return self._reference.id if self._id is None else self._id
 
     @property
     def exists(self) -> bool:
-        return self._doc != {}
+        return self._masked or self._doc != {}
+
+    def _mask(self, field_paths: Iterable[str]):
+        """
+        Keeps only the fields at `field_paths`, as a read with a field mask does.
+        They are copied right away, as they are all the snapshot needs.
+        """
+        if self.exists:
+            self._doc = project(self._doc, field_paths)
+            self._owns_doc = True
+            self._masked = True
 
     def to_dict(self) -> Document:
+        if not self._owns_doc:
+            self._doc = deepcopy(self._doc)
+            self._owns_doc = True
         return self._doc
 
     @property
-    def create_time(self) -> Timestamp:
-        timestamp = Timestamp.from_now()
-        return timestamp
+    def create_time(self) -> Timestamp | None:
+        """When the document was created, or None if it does not exist."""
+        if self._times is None or not self.exists:
+            return None
+        return self._times.create_time
 
     @property
-    def update_time(self) -> Timestamp:
-        return self.create_time
+    def update_time(self) -> Timestamp | None:
+        """When the document was last written to, or None if it does not exist."""
+        if self._times is None or not self.exists:
+            return None
+        return self._times.update_time
 
     @property
     def read_time(self) -> Timestamp:
@@ -46,6 +118,10 @@ class DocumentSnapshot:
         return timestamp
 
     def get(self, field_path: str) -> Any:
+        value = self._get(field_path)
+        return value if self._owns_doc else deepcopy(value)
+
+    def _get(self, field_path: str) -> Any:
         if not self.exists:
             return None
         else:
@@ -53,53 +129,77 @@ class DocumentSnapshot:
 
     def _get_by_field_path(self, field_path: str) -> Any:
         try:
-            return self.get(field_path)
+            return self._get(field_path)
         except KeyError:
             return None
 
 
-class DocumentReference:
-    def __init__(
-        self,
-        data: Store,
-        path: list[str],
-        parent: "CollectionReference",  # ruff: noqa: F821
-    ) -> None:
-        self._data = data
-        self._path = path
-        self.parent = parent
+class DocumentReference(Reference):
+    __slots__ = ()
 
     @property
     def id(self):
         return self._path[-1]
 
-    def get(self, transaction=None) -> DocumentSnapshot:
-        return DocumentSnapshot(self, get_by_path(self._data, self._path))
+    def get(
+        self, field_paths: Iterable[str] | None = None, transaction=None
+    ) -> DocumentSnapshot:
+        """
+        A snapshot of the document, with only the fields at `field_paths` if they
+        are given.
+        """
+        times = self._data.document_times(self._path)
+        doc_snapshot = DocumentSnapshot(
+            self, self._data.get_document(self._path), times
+        )
+        if field_paths is not None:
+            doc_snapshot._mask(field_paths)
+        return doc_snapshot
 
     def delete(self):
-        delete_by_path(self._data, self._path)
+        self._data.delete_document(self._path)
 
     def set(self, data: dict, merge=False):
-        if merge:
-            try:
-                self.update(deepcopy(data))
-            except NotFound:
-                self.set(data)
-        else:
-            set_by_path(self._data, self._path, deepcopy(data))
+        if not merge:
+            self._data.set_document(self._path, deepcopy(data))
+            return
+        # The document is read and written under one lock, so concurrent merges
+        # cannot drop each other's fields.
+        with self._data.writing((self._path[:-1],)):
+            document = self._data.get_document(self._path)
+            if document == {}:
+                self._data.set_document(self._path, deepcopy(data))
+            else:
+                self._data.set_document(self._path, updated_document(document, data))
 
     def update(self, data: dict[str, Any]):
-        document = get_by_path(self._data, self._path)
-        if document == {}:
-            raise NotFound(f"No document to update: {self._path}")
+        with self._data.writing((self._path[:-1],)):
+            document = self._data.get_document(self._path)
+            if document == {}:
+                raise NotFound(f"No document to update: {self._path}")
+            self._data.set_document(self._path, updated_document(document, data))
+
+    def on_snapshot(self, callback: Callable) -> "Watch":  # ruff: noqa: F821
+        """
+        Calls `callback(documents, changes, read_time)` with a snapshot of the
+        document now and after every write to it.
+        """
+        from mockfirestore.watch import DocumentWatch
 
-        apply_transformations(document, deepcopy(data))
+        return DocumentWatch(self, callback)
 
     def collection(self, name) -> "CollectionReference":  # ruff: noqa: F821
         from mockfirestore.collection import CollectionReference
 
-        document = get_by_path(self._data, self._path)
         new_path = self._path + [name]
-        if name not in document:
-            set_by_path(self._data, new_path, {})
+        self._data.ensure_collection(new_path)
         return CollectionReference(self._data, new_path, parent=self)
+
+
+def updated_document(document: Document, data: dict[str, Any]) -> Document:
+    """`document` with the field updates of `data` applied."""
+    # Stored documents may be shared with snapshots, so the update is applied to a
+    # copy of the fields it touches.
+    document = copy_paths(document, data)
+    apply_transformations(document, deepcopy(data))
+    return document
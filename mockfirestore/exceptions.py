@@ -19,3 +19,7 @@ class NotFound(ClientError):
 
 class AlreadyExists(Conflict):
     pass
+
+
+class Aborted(Conflict):
+    pass
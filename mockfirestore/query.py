@@ -1,11 +1,106 @@
-from collections.abc import Callable, Iterable, Iterator
-from itertools import islice, tee
+import heapq
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from itertools import chain, dropwhile, islice, takewhile
+from operator import itemgetter
 from typing import Any
 
-from mockfirestore._helpers import T
+from mockfirestore._helpers import Document
+from mockfirestore._index import (
+    _MISSING,
+    INDEXED_OPERATORS,
+    RANGE_OPERATORS,
+    CollectionIndex,
+    Cursor,
+    Descending,
+    IndexRange,
+    _identity,
+    get_field_value,
+    order_key,
+    range_bounds,
+    range_key,
+)
+from mockfirestore._predicate import compile_filters, filter_signature
+from mockfirestore.aggregation import AggregationQuery
 from mockfirestore.document import DocumentSnapshot
 
 
+@dataclass
+class QueryExplanation:
+    """
+    How a query was executed: the indexes it read, how many documents it had to
+    look at and how many it returned. An empty `indexes_used` means the whole
+    collection was scanned.
+    """
+
+    indexes_used: list[str]
+    documents_scanned: int
+    documents_returned: int
+
+
+class _QueryPlan:
+    """
+    The documents a query has to look at, and whether they already come in the
+    order the query asks for.
+    """
+
+    def __init__(
+        self,
+        indexes_used: list[str],
+        doc_ids: list[str] | None,
+        ordered: bool,
+        needs_sort: bool,
+    ) -> None:
+        self.indexes_used = indexes_used
+        self.doc_ids = doc_ids if ordered or doc_ids is None else sorted(doc_ids)
+        self.ordered = ordered
+        self.needs_sort = needs_sort
+        self.cursors_applied = False
+        self.documents_scanned = 0
+
+    def cost(self, collection_size: int) -> int:
+        scanned = collection_size if self.doc_ids is None else len(self.doc_ids)
+        return scanned * 2 if self.needs_sort else scanned
+
+    def seek(self, start: Cursor | None, end: Cursor | None):
+        """
+        Narrows an ordered plan read from an index to the documents between the
+        query's cursors, by binary search over the index.
+        """
+        if self.ordered and isinstance(self.doc_ids, IndexRange):
+            self.doc_ids = self.doc_ids.between(start, end)
+            self.cursors_applied = True
+
+    def scanning(
+        self, doc_snapshots: Iterable[DocumentSnapshot]
+    ) -> Iterator[DocumentSnapshot]:
+        for doc_snapshot in doc_snapshots:
+            self.documents_scanned += 1
+            yield doc_snapshot
+
+    def explain(self, documents_returned: int) -> QueryExplanation:
+        return QueryExplanation(
+            indexes_used=self.indexes_used,
+            documents_scanned=self.documents_scanned,
+            documents_returned=documents_returned,
+        )
+
+
+class _GroupPlan(_QueryPlan):
+    """The plans of each collection of a collection group query."""
+
+    def __init__(self, plans: list[tuple["Query", _QueryPlan]]) -> None:
+        indexes_used = [label for _, plan in plans for label in plan.indexes_used]
+        super().__init__(
+            list(dict.fromkeys(indexes_used)), None, ordered=False, needs_sort=True
+        )
+        self.plans = plans
+
+    def explain(self, documents_returned: int) -> QueryExplanation:
+        self.documents_scanned = sum(plan.documents_scanned for _, plan in self.plans)
+        return super().explain(documents_returned)
+
+
 class Query:
     def __init__(
         self,
@@ -18,12 +113,14 @@ class Query:
         start_at=None,
         end_at=None,
         all_descendants=False,
+        limit_to_last=False,
     ) -> None:
         self.parent = parent
         self.projection = projection
         self._field_filters = []
         self.orders = list(orders)
         self._limit = limit
+        self._limit_to_last = limit_to_last
         self._offset = offset
         self._start_at = start_at
         self._end_at = end_at
@@ -50,7 +147,7 @@ class Query:
         op: str | None = None,
         value: Any | None = None,
         *,
-        filter: Any | None = None
+        filter: Any | None = None,
     ) -> "Query":
         """
         Supports both old and new filter syntax:
@@ -79,56 +176,529 @@ class Query:
         self._add_field_filter(field, op, value)
         return self
 
-    def _process_pagination(self, doc_snapshots: Iterator[DocumentSnapshot]):
-        if self.orders:
-            for key, direction in self.orders:
-                doc_snapshots = sorted(
-                    doc_snapshots,
-                    key=lambda doc: doc.to_dict()[key],
-                    reverse=direction == "DESCENDING",
+    def _process_pagination(
+        self,
+        doc_snapshots: Iterator[DocumentSnapshot],
+        ordered: bool = False,
+        cursors_applied: bool = False,
+    ):
+        if self._limit_to_last and not self.orders:
+            raise ValueError("limit_to_last() requires at least one order_by().")
+
+        # Without order_by, documents of a collection always come by ID, the
+        # query's only order.
+        ordered = ordered or not (self.orders or self.all_descendants)
+        start, end = (None, None) if cursors_applied else self._cursors()
+        if ordered and (start or end):
+            # Already in query order: skip to the start cursor, stop at the end one.
+            keyed_snapshots = self._keyed_by_order(doc_snapshots)
+            keyed_snapshots = dropwhile(
+                lambda item: not _after_start(item[0], start), keyed_snapshots
+            )
+            keyed_snapshots = takewhile(
+                lambda item: _before_end(item[0], end), keyed_snapshots
+            )
+            doc_snapshots = (doc_snapshot for _, doc_snapshot in keyed_snapshots)
+        elif not ordered:
+            keyed_snapshots = self._keyed_by_order(doc_snapshots)
+            if self._limit:
+                if start or end:
+                    keyed_snapshots = (
+                        item
+                        for item in keyed_snapshots
+                        if _after_start(item[0], start) and _before_end(item[0], end)
+                    )
+                doc_snapshots = self._top_k(keyed_snapshots)
+            else:
+                keyed_snapshots = sorted(keyed_snapshots, key=itemgetter(0))
+                doc_snapshots = IndexRange(
+                    keyed_snapshots, 0, len(keyed_snapshots), key=itemgetter(0)
+                ).between(start, end)
+
+        if self._limit_to_last:
+            doc_snapshots = list(doc_snapshots)
+            end = max(len(doc_snapshots) - (self._offset or 0), 0)
+            doc_snapshots = doc_snapshots[max(end - self._limit, 0) : end]
+        else:
+            if self._offset:
+                doc_snapshots = islice(doc_snapshots, self._offset, None)
+
+            if self._limit:
+                doc_snapshots = islice(doc_snapshots, self._limit)
+
+        return iter(doc_snapshots)
+
+    def _sort_orders(self) -> list[tuple[list[str], bool]]:
+        """The ordered field paths, each with whether it sorts descending."""
+        return [
+            (field.split("."), direction == "DESCENDING")
+            for field, direction in self.orders
+        ]
+
+    def _cursors(self) -> tuple[Cursor | None, Cursor | None]:
+        """The start and end cursors of the query, as sort key prefixes."""
+        return self._cursor(self._start_at), self._cursor(self._end_at)
+
+    def _cursor(self, cursor: tuple[Any, bool] | None) -> Cursor | None:
+        """
+        Converts a cursor into the leading components of the sort key it points
+        at. A snapshot points at its own position, ID included; field values point
+        at the first or last document with those values, or at the place they
+        would sort if no document has them.
+        """
+        if not cursor:
+            return None
+        document_fields_or_snapshot, inclusive = cursor
+        orders = self._sort_orders()
+
+        if isinstance(document_fields_or_snapshot, DocumentSnapshot):
+            values = [
+                (
+                    document_fields_or_snapshot
+                    if path == ["__name__"]
+                    else get_field_value(document_fields_or_snapshot._doc, path)
                 )
-        if self._start_at:
-            document_fields_or_snapshot, before = self._start_at
-            doc_snapshots = self._apply_cursor(
-                document_fields_or_snapshot, doc_snapshots, before, True
+                for path, _ in orders
+            ]
+            if any(value is _MISSING for value in values):
+                raise ValueError(
+                    f"Cursor document {document_fields_or_snapshot.id!r} is missing "
+                    "a field of the query's order_by()."
+                )
+        elif isinstance(document_fields_or_snapshot, dict):
+            if not orders:
+                raise ValueError("Cursor field values require an order_by().")
+            values = []
+            for field, _ in self.orders:
+                if field in document_fields_or_snapshot:
+                    value = document_fields_or_snapshot[field]
+                else:
+                    value = get_field_value(
+                        document_fields_or_snapshot, field.split(".")
+                    )
+                if value is _MISSING:
+                    raise ValueError(
+                        f"Cursor has no value for ordered field {field!r}."
+                    )
+                values.append(value)
+        else:
+            values = list(document_fields_or_snapshot)
+            if len(values) > len(orders):
+                raise ValueError("Cursor has more values than the query's order_by().")
+
+        key = []
+        for value, (path, descending) in zip(values, orders):
+            if path == ["__name__"]:
+                component = self._name_key(value)
+            else:
+                component = order_key(value)
+            key.append(Descending(component) if descending else component)
+        if isinstance(document_fields_or_snapshot, DocumentSnapshot):
+            name = self._name_key(document_fields_or_snapshot)
+            name_descending = bool(orders) and orders[-1][1]
+            key.append(Descending(name) if name_descending else name)
+        return tuple(key), inclusive
+
+    def _name_key(self, document: Any) -> str | tuple[str, ...]:
+        """
+        The sort key component of a document's name, given as a snapshot, a
+        reference or a string: its ID, or its full path for collection group
+        queries, whose documents come from several collections.
+        """
+        if isinstance(document, DocumentSnapshot):
+            return document._key if self.all_descendants else document.id
+        if not self.all_descendants:
+            return getattr(document, "id", document)
+        if isinstance(document, str):
+            return tuple(document.split("/"))
+        return tuple(document._path)
+
+    def _keyed_by_order(
+        self, doc_snapshots: Iterable[DocumentSnapshot]
+    ) -> Iterator[tuple[tuple, DocumentSnapshot]]:
+        """
+        Pairs each document with its position in the query's order: the ordered
+        fields, compared the way Firestore orders values of different types, then
+        the document name in the direction of the last order. Documents missing one
+        of the ordered fields are left out, as Firestore does.
+        """
+        orders = self._sort_orders()
+        name_descending = bool(orders) and orders[-1][1]
+        for doc_snapshot in doc_snapshots:
+            name = self._name_key(doc_snapshot)
+            key = []
+            for path, descending in orders:
+                if path == ["__name__"]:
+                    component = name
+                else:
+                    value = get_field_value(doc_snapshot._doc, path)
+                    if value is _MISSING:
+                        break
+                    component = order_key(value)
+                key.append(Descending(component) if descending else component)
+            else:
+                key.append(Descending(name) if name_descending else name)
+                yield tuple(key), doc_snapshot
+
+    def _top_k(
+        self, keyed_snapshots: Iterable[tuple[tuple, DocumentSnapshot]]
+    ) -> list[DocumentSnapshot]:
+        """
+        The documents that survive offset and limit, in query order, found with a
+        bounded heap instead of sorting every document.
+        """
+        count = (self._offset or 0) + self._limit
+        if self._limit_to_last:
+            items = heapq.nlargest(count, keyed_snapshots, key=itemgetter(0))
+            items.reverse()
+        else:
+            items = heapq.nsmallest(count, keyed_snapshots, key=itemgetter(0))
+        return [doc_snapshot for _, doc_snapshot in items]
+
+    def _process_field_filters(
+        self, doc_snapshots: Iterable[DocumentSnapshot]
+    ) -> Iterator[DocumentSnapshot]:
+        predicate = compile_filters(self._field_filters)
+        for doc_snapshot in doc_snapshots:
+            if predicate(doc_snapshot._doc):
+                yield doc_snapshot
+
+    def _plan(self) -> _QueryPlan:
+        """Picks the cheapest way to read the documents this query may return."""
+        if self.all_descendants:
+            return self._group_plan()
+        store = self.parent._data
+        orders = [(field, direction or "ASCENDING") for field, direction in self.orders]
+        # Plans are read from the indexes while the collection cannot change; the
+        # ID lists and ranges they end up with are never modified afterwards.
+        with store.reading(self.parent._path):
+            documents = store.collection(self.parent._path)
+            index = store.collection_index(self.parent._path)
+            plans = [self._scan_plan(orders)]
+            plans.extend(self._composite_index_plans(index, documents, orders))
+            plans.extend(self._field_index_plans(index, documents, orders))
+            start, end = self._cursors()
+            if start or end:
+                for plan in plans:
+                    plan.seek(start, end)
+            return min(plans, key=lambda plan: plan.cost(len(documents)))
+
+    def _group_plan(self) -> "_GroupPlan":
+        """
+        Plans a collection group query as one query per collection of the group,
+        each with the same filters and orders, read from that collection's indexes.
+        """
+        plans = []
+        for path in self.parent._data.collection_group_paths(self.parent._path[-1]):
+            query = Query(
+                self._group_collection(path),
+                field_filters=[
+                    (field, op, value) for field, op, value in self._field_filters
+                ],
+                orders=self.orders,
+            )
+            plans.append((query, query._plan()))
+        return _GroupPlan(plans)
+
+    def _group_collection(self, path: Sequence[str]) -> "CollectionReference":
+        """A reference to the collection at `path`, of the group this query reads."""
+        store = self.parent._data
+        collection_type = type(self.parent)
+        parent = None
+        if len(path) > 1:
+            parent = collection_type(store, list(path[:-2]))._reference(path[-2])
+        return collection_type(store, list(path), parent=parent)
+
+    def _scan_plan(self, orders: list[tuple[str, str]]) -> _QueryPlan:
+        """
+        Reads the whole collection. Queries without order_by, or ordered by ID
+        only, read it straight from the collection's sorted IDs.
+        """
+        if any(field != "__name__" for field, _ in orders):
+            return _QueryPlan([], None, ordered=False, needs_sort=True)
+        doc_ids = self.parent._data.document_ids(self.parent._path)
+        # The sort key of a document is its ID, once per order plus the tie-break.
+        width = len(orders) + 1
+        return _QueryPlan(
+            [],
+            IndexRange(
+                doc_ids,
+                0,
+                len(doc_ids),
+                key=lambda doc_id: (doc_id,) * width,
+                reverse=bool(orders) and orders[-1][1] == "DESCENDING",
+                item=_identity,
+            ),
+            ordered=True,
+            needs_sort=False,
+        )
+
+    def _field_index_plans(
+        self,
+        index: CollectionIndex,
+        documents: dict[str, Document],
+        orders: list[tuple[str, str]],
+    ) -> Iterator[_QueryPlan]:
+        matches, indexes_used = [], []
+        for field, op, value in self._field_filters:
+            if op not in INDEXED_OPERATORS or value is None:
+                continue
+            doc_ids = index.field(field, documents).lookup(op, value)
+            if doc_ids is not None:
+                matches.append(doc_ids)
+                mode = "CONTAINS" if op.startswith("array_contains") else "ASC"
+                indexes_used.append(f"({field} {mode})")
+        if matches:
+            matches.sort(key=len)
+            doc_ids = matches[0].intersection(*matches[1:])
+            yield _QueryPlan(
+                list(dict.fromkeys(indexes_used)),
+                list(doc_ids),
+                ordered=False,
+                needs_sort=bool(orders),
+            )
+
+        if len(orders) == 1 and orders[0][0] != "__name__":
+            field, direction = orders[0]
+            bounds = range_bounds(
+                (op, value)
+                for filter_field, op, value in self._field_filters
+                if filter_field == field and op in RANGE_OPERATORS and value is not None
             )
+            if bounds is not None:
+                descending = direction == "DESCENDING"
+                doc_ids = index.field(field, documents).range_ids(bounds, descending)
+                yield _QueryPlan(
+                    [f"({field} {'DESC' if descending else 'ASC'})"],
+                    doc_ids,
+                    ordered=True,
+                    needs_sort=False,
+                )
 
-        if self._end_at:
-            document_fields_or_snapshot, before = self._end_at
-            doc_snapshots = self._apply_cursor(
-                document_fields_or_snapshot, doc_snapshots, before, False
+    def _composite_index_plans(
+        self,
+        index: CollectionIndex,
+        documents: dict[str, Document],
+        orders: list[tuple[str, str]],
+    ) -> Iterator[_QueryPlan]:
+        equalities, ranges = {}, {}
+        for field, op, value in self._field_filters:
+            if value is None:
+                continue
+            if op == "==" and range_key(value) is not None:
+                equalities.setdefault(field, value)
+            elif op in RANGE_OPERATORS:
+                ranges.setdefault(field, []).append((op, value))
+
+        # Documents that lack a field are left out of a composite index, which can
+        # only serve queries that leave them out too: those that filter or order on
+        # each of its fields.
+        constrained = {field for field, _, _ in self._field_filters}
+        constrained.update(field for field, _ in orders)
+        constrained.add("__name__")
+
+        definitions = self.parent._data.index_definitions.get(self.parent._path[-1])
+        for fields in definitions or ():
+            if any(field not in constrained for field, _ in fields):
+                continue
+            prefix_length = 0
+            while (
+                prefix_length < len(fields) and fields[prefix_length][0] in equalities
+            ):
+                prefix_length += 1
+            remaining = list(fields[prefix_length:])
+            bounded = bool(remaining) and remaining[0][0] in ranges
+            # Without order_by, results come by ascending ID, which is how the
+            # index breaks ties when its last field is ascending.
+            ordered = remaining == orders and (
+                bool(orders) or fields[-1][1] == "ASCENDING"
             )
+            if not (prefix_length or bounded or (ordered and orders)):
+                continue
 
-        if self._offset:
-            doc_snapshots = islice(doc_snapshots, self._offset, None)
+            composite_index = index.composite(fields, documents)
+            prefix = composite_index.prefix_key(
+                [equalities[field] for field, _ in fields[:prefix_length]]
+            )
+            bounds = range_bounds(ranges[remaining[0][0]]) if bounded else None
+            start, end = composite_index.span(prefix, bounds)
+            yield _QueryPlan(
+                [repr(composite_index)],
+                composite_index.doc_ids(start, end, prefix_length),
+                ordered=ordered,
+                needs_sort=bool(orders) and not ordered,
+            )
 
-        if self._limit:
-            doc_snapshots = islice(doc_snapshots, self._limit)
+    def _plan_snapshots(self, doc_ids: list[str]) -> Iterator[DocumentSnapshot]:
+        store = self.parent._data
+        times = store.collection_times(self.parent._path)
+        documents = store.collection(self.parent._path)
+        for doc_id in doc_ids:
+            doc_times = times.get(doc_id)
+            document = documents.get(doc_id)
+            if document:
+                yield DocumentSnapshot._of(self.parent, doc_id, document, doc_times)
+
+    def _scanned(self, plan: _QueryPlan) -> Iterator[DocumentSnapshot]:
+        """The documents read by `plan`, before the query's filters."""
+        if isinstance(plan, _GroupPlan):
+            return chain.from_iterable(
+                query._scanned(collection_plan) for query, collection_plan in plan.plans
+            )
+        doc_ids = plan.doc_ids
+        if doc_ids is None:
+            doc_ids = self.parent._data.document_ids(self.parent._path)
+        return plan.scanning(self._plan_snapshots(doc_ids))
+
+    def _matches(self, plan: _QueryPlan) -> Iterator[DocumentSnapshot]:
+        """The documents read by `plan` that pass the query's filters."""
+        return self._process_field_filters(self._scanned(plan))
+
+    def _documents(self, plan: _QueryPlan) -> Iterator[Document]:
+        """The stored documents read by `plan` that pass the query's filters."""
+        if isinstance(plan, _GroupPlan):
+            return chain.from_iterable(
+                query._documents(collection_plan)
+                for query, collection_plan in plan.plans
+            )
+        doc_ids = plan.doc_ids
+        if doc_ids is None:
+            doc_ids = self.parent._data.document_ids(self.parent._path)
+        documents = self.parent._data.collection(self.parent._path)
+        predicate = compile_filters(self._field_filters)
+        return (
+            document
+            for document in map(documents.get, plan.scanning(doc_ids))
+            if document and predicate(document)
+        )
+
+    def _run(self, plan: _QueryPlan) -> Iterator[DocumentSnapshot]:
+        return self._process_pagination(
+            self._matches(plan), plan.ordered, plan.cursors_applied
+        )
 
+    def stream(self, transaction=None) -> Iterator[DocumentSnapshot]:
+        slot = self._cache_slot()
+        if slot is None:
+            return self._run(self._plan())
+        doc_snapshots = self._cached(slot)
+        if doc_snapshots is None:
+            doc_snapshots = self._cache(slot, self._run(self._plan()))
         return iter(doc_snapshots)
 
-    def _process_field_filters(
-        self, doc_snapshots: Iterator[DocumentSnapshot]
-    ) -> Iterable[DocumentSnapshot]:
-        for field, compare, value in self._field_filters:
-            doc_snapshots = [
-                doc_snapshot
+    def _cache_slot(self) -> tuple[tuple, int] | None:
+        """
+        The key and collection version under which the results of this query are
+        cached, or None if the client does not cache query results.
+        """
+        store = self.parent._data
+        if store.query_cache is None:
+            return None
+        signature = filter_signature(self._field_filters)
+        if signature is None:
+            return None
+        # Sync and async queries cache snapshots with references of their own kind.
+        key = (
+            type(self.parent),
+            tuple(self.parent._path),
+            self.all_descendants,
+            frozenset(signature),
+            tuple(
+                (field, direction or "ASCENDING") for field, direction in self.orders
+            ),
+            self._cursors(),
+            self._limit,
+            self._offset,
+            self._limit_to_last,
+        )
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        if self.all_descendants:
+            return key, store.group_version(self.parent._path[-1])
+        return key, store.version(self.parent._path)
+
+    def _cached(self, slot: tuple[tuple, int]) -> list[DocumentSnapshot] | None:
+        results = self.parent._data.query_cache.get(*slot)
+        if results is None:
+            return None
+        return [
+            DocumentSnapshot._of(collection, doc_id, document, times)
+            for collection, doc_id, document, times in results
+        ]
+
+    def _cache(
+        self, slot: tuple[tuple, int], doc_snapshots: Iterable[DocumentSnapshot]
+    ) -> list[DocumentSnapshot]:
+        doc_snapshots = list(doc_snapshots)
+        self.parent._data.query_cache.put(
+            *slot,
+            [
+                (
+                    doc_snapshot._collection or doc_snapshot.reference.parent,
+                    doc_snapshot.id,
+                    doc_snapshot._doc,
+                    doc_snapshot._times,
+                )
                 for doc_snapshot in doc_snapshots
-                if compare(doc_snapshot._get_by_field_path(field), value)
-            ]
+            ],
+        )
         return doc_snapshots
 
-    def stream(self, transaction=None) -> Iterator[DocumentSnapshot]:
-        doc_snapshots = (doc for doc in self.parent.stream() if doc.exists)
-        doc_snapshots = self._process_field_filters(doc_snapshots)
-        return self._process_pagination(doc_snapshots)
+    def explain(self) -> QueryExplanation:
+        """
+        Runs the query and reports the index it was served from, together with the
+        number of documents scanned and returned.
+        """
+        plan = self._plan()
+        return plan.explain(len(list(self._run(plan))))
 
     def get(self, transaction=None) -> list[DocumentSnapshot]:
         return list(self.stream())
 
+    def count(self, alias: str | None = None) -> AggregationQuery:
+        return AggregationQuery(self).count(alias)
+
+    def sum(self, field_ref: str, alias: str | None = None) -> AggregationQuery:
+        return AggregationQuery(self).sum(field_ref, alias)
+
+    def avg(self, field_ref: str, alias: str | None = None) -> AggregationQuery:
+        return AggregationQuery(self).avg(field_ref, alias)
+
+    def _aggregated_documents(self) -> Iterator[Document]:
+        """
+        The stored documents this query returns, for aggregations. Unless the
+        query is ordered or paginated, they are read without building snapshots.
+        Only a single collection is read in query order, so a limit on a group
+        query also goes through the full pipeline.
+        """
+        plan = self._plan()
+        if (
+            self.orders
+            or self._start_at
+            or self._end_at
+            or self._offset
+            or self._limit_to_last
+            or (self._limit and self.all_descendants)
+        ):
+            return (doc_snapshot._doc for doc_snapshot in self._run(plan))
+        documents = self._documents(plan)
+        if self._limit:
+            documents = islice(documents, self._limit)
+        return documents
+
+    def on_snapshot(self, callback: Callable) -> "Watch":  # ruff: noqa: F821
+        """
+        Calls `callback(documents, changes, read_time)` with the results of the
+        query now and after every write that changes them.
+        """
+        from mockfirestore.watch import QueryWatch
+
+        return QueryWatch(self, callback)
+
     def _add_field_filter(self, field: str, op: str, value: Any):
-        compare = self._compare_func(op)
-        self._field_filters.append((field, compare, value))
+        self._field_filters.append((field, op, value))
 
     def order_by(self, key: str, direction: str | None = "ASCENDING") -> "Query":
         self.orders.append((key, direction))
@@ -136,114 +706,54 @@ class Query:
 
     def limit(self, limit_amount: int) -> "Query":
         self._limit = limit_amount
+        self._limit_to_last = False
+        return self
+
+    def limit_to_last(self, count: int) -> "Query":
+        self._limit = count
+        self._limit_to_last = True
         return self
 
     def offset(self, offset_amount: int) -> "Query":
         self._offset = offset_amount
         return self
 
-    def start_at(self, document_fields_or_snapshot: dict | DocumentSnapshot) -> "Query":
+    def start_at(
+        self, document_fields_or_snapshot: dict | list | DocumentSnapshot
+    ) -> "Query":
         self._start_at = (document_fields_or_snapshot, True)
         return self
 
     def start_after(
-        self, document_fields_or_snapshot: dict | DocumentSnapshot
+        self, document_fields_or_snapshot: dict | list | DocumentSnapshot
     ) -> "Query":
         self._start_at = (document_fields_or_snapshot, False)
         return self
 
-    def end_at(self, document_fields_or_snapshot: dict | DocumentSnapshot) -> "Query":
+    def end_at(
+        self, document_fields_or_snapshot: dict | list | DocumentSnapshot
+    ) -> "Query":
         self._end_at = (document_fields_or_snapshot, True)
         return self
 
     def end_before(
-        self, document_fields_or_snapshot: dict | DocumentSnapshot
+        self, document_fields_or_snapshot: dict | list | DocumentSnapshot
     ) -> "Query":
         self._end_at = (document_fields_or_snapshot, False)
         return self
 
-    def _apply_cursor(
-        self,
-        document_fields_or_snapshot: dict | DocumentSnapshot,
-        doc_snapshot: Iterator[DocumentSnapshot],
-        before: bool,
-        start: bool,
-    ) -> Iterator[DocumentSnapshot]:
-        docs, doc_snapshot = tee(doc_snapshot)
-        for idx, doc in enumerate(doc_snapshot):
-            index = None
-            if isinstance(document_fields_or_snapshot, dict):
-                for k, v in document_fields_or_snapshot.items():
-                    if doc.to_dict().get(k, None) == v:
-                        index = idx
-                    else:
-                        index = None
-                        break
-            elif isinstance(document_fields_or_snapshot, DocumentSnapshot):
-                if doc.id == document_fields_or_snapshot.id:
-                    index = idx
-            if index is not None:
-                if before and start:
-                    return islice(docs, index, None, None)
-                elif not before and start:
-                    return islice(docs, index + 1, None, None)
-                elif before and not start:
-                    return islice(docs, 0, index + 1, None)
-                elif not before and not start:
-                    return islice(docs, 0, index, None)
-
-    def _compare_func(self, op: str) -> Callable[[T, T], bool]:
-        f = None
-        if op == "==":
-
-            def f(x, y):
-                return x == y
-
-        elif op == "!=":
-
-            def f(x, y):
-                return x != y
-
-        elif op == "<":
-
-            def f(x, y):
-                return x < y
-
-        elif op == "<=":
-
-            def f(x, y):
-                return x <= y
-
-        elif op == ">":
-
-            def f(x, y):
-                return x > y
-
-        elif op == ">=":
-
-            def f(x, y):
-                return x >= y
-
-        elif op == "in":
-
-            def f(x, y):
-                return x in y
-
-        elif op == "array_contains":
-
-            def f(x, y):
-                return y in x
-
-        elif op == "array_contains_any":
 
-            def f(x, y):
-                return any([(val in y) for val in x])
+def _after_start(key: tuple, cursor: Cursor | None) -> bool:
+    if cursor is None:
+        return True
+    values, inclusive = cursor
+    prefix = key[: len(values)]
+    return prefix > values or (inclusive and prefix == values)
 
-        def _comp_func(x, y):
-            if x is None:
-                return False
-            if y is None:
-                return True
-            return f(x, y)
 
-        return _comp_func
+def _before_end(key: tuple, cursor: Cursor | None) -> bool:
+    if cursor is None:
+        return True
+    values, inclusive = cursor
+    prefix = key[: len(values)]
+    return prefix < values or (inclusive and prefix == values)
@@ -1,26 +1,33 @@
+import functools
 from collections.abc import Callable, Iterable
-from functools import partial
+from typing import Any
 
-from mockfirestore._helpers import Timestamp, generate_random_string
+from mockfirestore import Aborted
+from mockfirestore._helpers import generate_random_string
+from mockfirestore._store import Path
+from mockfirestore.batch import Write, WriteResult, commit_writes
 from mockfirestore.document import DocumentReference, DocumentSnapshot
 from mockfirestore.query import Query
 
 MAX_ATTEMPTS = 5
+# Recorded for documents read stale, so that committing aborts.
+_STALE = -1
 _MISSING_ID_TEMPLATE = "The transaction has no transaction ID, so it cannot be {}."
 _CANT_BEGIN = "The transaction has already begun. Current transaction ID: {!r}."
 _CANT_ROLLBACK = _MISSING_ID_TEMPLATE.format("rolled back")
 _CANT_COMMIT = _MISSING_ID_TEMPLATE.format("committed")
-
-
-class WriteResult:
-    def __init__(self):
-        self.update_time = Timestamp.from_now()
+_EXCEED_ATTEMPTS_TEMPLATE = "Failed to commit transaction in {:d} attempts."
 
 
 class Transaction:
     """
     This mostly follows the model from
     https://googleapis.dev/python/firestore/latest/transaction.html
+
+    Transactions are optimistic: every document read records the version it was
+    read at, and committing fails with a retryable `Aborted` error if one of them
+    has been written since. `attempts` counts how many times the transaction
+    began, so retries under contention can be measured.
     """
 
     def __init__(self, client, max_attempts=MAX_ATTEMPTS, read_only=False):
@@ -28,8 +35,10 @@ class Transaction:
         self._max_attempts = max_attempts
         self._read_only = read_only
         self._id = None
-        self._write_ops = []
+        self._write_ops: list[Write] = []
+        self._read_versions: dict[Path, int] = {}
         self.write_results = None
+        self.attempts = 0
 
     @property
     def in_progress(self):
@@ -42,9 +51,11 @@ class Transaction:
     def _begin(self, retry_id=None):
         # generate a random ID to set the transaction as in_progress
         self._id = generate_random_string()
+        self.attempts += 1
 
     def _clean_up(self):
         self._write_ops.clear()
+        self._read_versions.clear()
         self._id = None
 
     def _rollback(self):
@@ -57,20 +68,52 @@ class Transaction:
         if not self.in_progress:
             raise ValueError(_CANT_COMMIT)
 
-        results = []
-        for write_op in self._write_ops:
-            write_op()
-            results.append(WriteResult())
+        store = self._client._data
+        # Documents read are locked too, so they cannot change between the check
+        # and the writes.
+        paths = [path[:-1] for path in self._read_versions]
+        paths.extend(reference._path[:-1] for reference, _, _ in self._write_ops)
+        with store.writing(paths):
+            for path, version in self._read_versions.items():
+                if store.document_version(path) != version:
+                    transaction_id = self._id
+                    self._clean_up()
+                    raise Aborted(
+                        f"Transaction {transaction_id!r} read {'/'.join(path)}, "
+                        "which has been written since."
+                    )
+            results = commit_writes(store, self._write_ops)
         self.write_results = results
         self._clean_up()
         return results
 
+    def _record_read(self, doc_snapshot: DocumentSnapshot):
+        """
+        Remembers the version of a document read by the transaction: the version
+        of the data in the snapshot, or one that never matches if the document
+        has been written since it was read.
+        """
+        path = doc_snapshot._key
+        if path not in self._read_versions:
+            version = self._client._data.read_version(path, doc_snapshot._doc)
+            self._read_versions[path] = _STALE if version is None else version
+
+    def _recording(
+        self, doc_snapshots: Iterable[DocumentSnapshot]
+    ) -> Iterable[DocumentSnapshot]:
+        for doc_snapshot in doc_snapshots:
+            self._record_read(doc_snapshot)
+            yield doc_snapshot
+
     def get_all(
         self, references: Iterable[DocumentReference]
     ) -> Iterable[DocumentSnapshot]:
-        return self._client.get_all(references)
+        return self._recording(self._client.get_all(references))
 
     def get(self, ref_or_query) -> Iterable[DocumentSnapshot]:
+        return self._recording(self._source(ref_or_query))
+
+    def _source(self, ref_or_query):
         if isinstance(ref_or_query, DocumentReference):
             return self._client.get_all([ref_or_query])
         elif isinstance(ref_or_query, Query):
@@ -84,27 +127,22 @@ class Transaction:
     # methods from
     # https://googleapis.dev/python/firestore/latest/batch.html#google.cloud.firestore_v1.batch.WriteBatch
 
-    def _add_write_op(self, write_op: Callable):
+    def _add_write_op(self, write_op: Write):
         if self._read_only:
             raise ValueError("Cannot perform write operation in read-only transaction.")
         self._write_ops.append(write_op)
 
     def create(self, reference: DocumentReference, document_data):
-        # this is a no-op, because if we have a DocumentReference
-        # it's already in the MockFirestore
-        ...
+        self._add_write_op((reference, "create", document_data))
 
     def set(self, reference: DocumentReference, document_data: dict, merge=False):
-        write_op = partial(reference.set, document_data, merge=merge)
-        self._add_write_op(write_op)
+        self._add_write_op((reference, "merge" if merge else "set", document_data))
 
     def update(self, reference: DocumentReference, field_updates: dict, option=None):
-        write_op = partial(reference.update, field_updates)
-        self._add_write_op(write_op)
+        self._add_write_op((reference, "update", field_updates))
 
     def delete(self, reference: DocumentReference, option=None):
-        write_op = reference.delete
-        self._add_write_op(write_op)
+        self._add_write_op((reference, "delete", None))
 
     def commit(self):
         return self._commit()
@@ -115,3 +153,37 @@ class Transaction:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None:
             self.commit()
+
+
+class _Transactional:
+    """
+    Runs a function in a transaction, retrying it from the start when the commit
+    is aborted by a conflicting write, up to the transaction's `max_attempts`.
+    """
+
+    def __init__(self, to_wrap: Callable) -> None:
+        self.to_wrap = to_wrap
+        functools.update_wrapper(self, to_wrap)
+
+    def __call__(self, transaction: Transaction, *args, **kwargs) -> Any:
+        for _ in range(transaction._max_attempts):
+            transaction._begin()
+            try:
+                result = self.to_wrap(transaction, *args, **kwargs)
+                transaction._commit()
+                return result
+            except Aborted:
+                # Raised by the commit or by the function itself: either way, the
+                # next attempt starts with no reads or writes.
+                transaction._clean_up()
+                continue
+            except BaseException:
+                if transaction.in_progress:
+                    transaction._rollback()
+                raise
+        raise ValueError(_EXCEED_ATTEMPTS_TEMPLATE.format(transaction._max_attempts))
+
+
+def transactional(to_wrap: Callable) -> _Transactional:
+    """Makes `to_wrap` run in the transaction passed as its first argument."""
+    return _Transactional(to_wrap)
@@ -0,0 +1,365 @@
+import threading
+from bisect import bisect_left, insort
+from collections import deque
+from collections.abc import Callable
+from enum import Enum
+from operator import itemgetter
+
+from mockfirestore._helpers import Document, DocumentTimes, Timestamp
+from mockfirestore._predicate import compile_filters
+from mockfirestore._store import Change, Path
+from mockfirestore.document import DocumentReference, DocumentSnapshot
+from mockfirestore.query import Query, _after_start, _before_end
+
+# (documents, changes, read time), as passed to the callback.
+Event = tuple[list[DocumentSnapshot], list["DocumentChange"], Timestamp]
+
+
+class ChangeType(Enum):
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class DocumentChange:
+    """
+    A document that entered, left or changed within the results of a listener.
+    `old_index` is its position in the previous results, or -1 if it was added;
+    `new_index` its position in the new ones, or -1 if it was removed.
+    """
+
+    def __init__(
+        self,
+        type: ChangeType,
+        document: DocumentSnapshot,
+        old_index: int,
+        new_index: int,
+    ) -> None:
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+    def __repr__(self):
+        return (
+            f"<DocumentChange {self.type.name} {self.document.id!r} "
+            f"old_index={self.old_index} new_index={self.new_index}>"
+        )
+
+
+class Watch:
+    """
+    A listener registered with `on_snapshot`. Its callback is called with the
+    current results on registration, then again after each write that changes
+    them, as `callback(documents, changes, read_time)`.
+
+    Callbacks run on the thread that wrote, once it has released its locks, so
+    they may read and write the store. Events of one listener are delivered one
+    at a time and in the order of the writes: while a thread is calling back, the
+    events of other writes queue up for it to deliver next, including those of
+    writes made by the callback itself.
+    """
+
+    def __init__(self, store, key: Path | str, callback: Callable) -> None:
+        self._store = store
+        self._key = key
+        self._callback = callback
+        self._state_lock = threading.Lock()
+        self._events: deque[Event] = deque()
+        self._delivering = False
+        # Writes that came in while the current results were being read.
+        self._backlog: list[tuple[Path, list[Change]]] | None = []
+        self._active = True
+        store.add_listener(self, key)
+
+    def _start(self):
+        """
+        Reads the current results, catches up with the writes made meanwhile and
+        calls back with every result as added.
+        """
+        try:
+            self._load()
+        except BaseException:
+            self.unsubscribe()
+            raise
+        with self._state_lock:
+            backlog, self._backlog = self._backlog, None
+            for collection_path, changes in backlog:
+                self._apply(collection_path, changes)
+            doc_snapshots = self._results()
+            changes = [
+                DocumentChange(ChangeType.ADDED, doc_snapshot, -1, position)
+                for position, doc_snapshot in enumerate(doc_snapshots)
+                if doc_snapshot.exists
+            ]
+            self._events.append((doc_snapshots, changes, Timestamp.from_now()))
+        self.deliver()
+
+    def unsubscribe(self):
+        self._active = False
+        self._store.remove_listener(self, self._key)
+
+    def on_changes(self, collection_path: Path, changes: list[Change]) -> bool:
+        with self._state_lock:
+            if not self._active:
+                return False
+            if self._backlog is not None:
+                self._backlog.append((collection_path, changes))
+                return False
+            event = self._event(collection_path, changes)
+            if event is None:
+                return False
+            self._events.append(event)
+            return True
+
+    def deliver(self):
+        with self._state_lock:
+            if self._delivering:
+                return
+            self._delivering = True
+        try:
+            while True:
+                with self._state_lock:
+                    if not self._events:
+                        self._delivering = False
+                        return
+                    event = self._events.popleft()
+                if self._active:
+                    self._callback(*event)
+        except BaseException:
+            with self._state_lock:
+                self._delivering = False
+            raise
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _results(self) -> list[DocumentSnapshot]:
+        raise NotImplementedError
+
+    def _apply(self, collection_path: Path, changes: list[Change]) -> list[Path]:
+        raise NotImplementedError
+
+    def _event(self, collection_path: Path, changes: list[Change]) -> Event | None:
+        raise NotImplementedError
+
+
+class DocumentWatch(Watch):
+    """Listens to a single document, which may not exist."""
+
+    def __init__(self, reference: DocumentReference, callback: Callable) -> None:
+        self._reference = reference
+        self._doc_id = reference.id
+        self._document: Document = {}
+        self._times: DocumentTimes | None = None
+        super().__init__(reference._data, tuple(reference._path), callback)
+        self._start()
+
+    def _load(self):
+        store, path = self._reference._data, self._reference._path
+        self._times = store.document_times(path)
+        self._document = store.get_document(path)
+
+    def _results(self) -> list[DocumentSnapshot]:
+        return [DocumentSnapshot(self._reference, self._document, self._times)]
+
+    def _apply(self, collection_path: Path, changes: list[Change]) -> list[Path]:
+        changed = []
+        for doc_id, _, document in changes:
+            if doc_id == self._doc_id:
+                path = (*collection_path, doc_id)
+                self._times = self._store.document_times(path)
+                self._document = document or {}
+                changed.append(path)
+        return changed
+
+    def _event(self, collection_path: Path, changes: list[Change]) -> Event | None:
+        previous, previous_times = self._document, self._times
+        self._apply(collection_path, changes)
+        if self._document is previous or (not previous and not self._document):
+            return None
+        snapshot = DocumentSnapshot(self._reference, self._document, self._times)
+        if not previous:
+            change = DocumentChange(ChangeType.ADDED, snapshot, -1, 0)
+        elif not self._document:
+            old_snapshot = DocumentSnapshot(self._reference, previous, previous_times)
+            change = DocumentChange(ChangeType.REMOVED, old_snapshot, 0, -1)
+        else:
+            change = DocumentChange(ChangeType.MODIFIED, snapshot, 0, 0)
+        return [snapshot], [change], Timestamp.from_now()
+
+
+class QueryWatch(Watch):
+    """
+    Listens to the results of a query. Every document that passes the query's
+    filters and cursors is kept in query order, and each write is only checked
+    against the compiled filters to move one document in or out of them; offset
+    and limit then pick the results.
+    """
+
+    def __init__(self, query: Query, callback: Callable) -> None:
+        if query._limit_to_last and not query.orders:
+            raise ValueError("limit_to_last() requires at least one order_by().")
+        self._query = query
+        self._predicate = compile_filters(query._field_filters)
+        self._start_at, self._end_at = query._cursors()
+        # (sort key, snapshot) of every match, in query order.
+        self._matches: list[tuple[tuple, DocumentSnapshot]] = []
+        self._keys: dict[Path, tuple] = {}
+        key = (
+            query.parent._path[-1]
+            if query.all_descendants
+            else tuple(query.parent._path)
+        )
+        super().__init__(query.parent._data, key, callback)
+        self._start()
+
+    def _load(self):
+        query = self._query
+        keyed_snapshots = query._keyed_by_order(query._matches(query._plan()))
+        self._matches = sorted(
+            (
+                item
+                for item in keyed_snapshots
+                if _after_start(item[0], self._start_at)
+                and _before_end(item[0], self._end_at)
+            ),
+            key=itemgetter(0),
+        )
+        self._keys = {doc_snapshot._key: key for key, doc_snapshot in self._matches}
+
+    def _results(self) -> list[DocumentSnapshot]:
+        """The matches within the query's offset and limit."""
+        query = self._query
+        offset, limit = query._offset or 0, query._limit
+        if query._limit_to_last:
+            end = max(len(self._matches) - offset, 0)
+            start = max(end - limit, 0) if limit else 0
+        else:
+            start = offset
+            end = start + limit if limit else len(self._matches)
+        return [doc_snapshot for _, doc_snapshot in self._matches[start:end]]
+
+    def _position(self, path: Path) -> int:
+        """The position of a match in query order, or -1."""
+        key = self._keys.get(path)
+        if key is None:
+            return -1
+        return bisect_left(self._matches, key, key=itemgetter(0))
+
+    def _apply(self, collection_path: Path, changes: list[Change]) -> list[Path]:
+        """Updates the matches with `changes`; returns the paths that changed."""
+        query = self._query
+        if query.all_descendants:
+            collection = query._group_collection(collection_path)
+        else:
+            collection = query.parent
+        times = self._store.collection_times(collection_path)
+        changed = []
+        for doc_id, _, document in changes:
+            path = (*collection_path, doc_id)
+            position = self._position(path)
+            if position >= 0:
+                if self._matches[position][1]._doc is document:
+                    continue
+                del self._matches[position]
+                del self._keys[path]
+            changed.append(path)
+            if not document or not self._predicate(document):
+                continue
+            doc_snapshot = DocumentSnapshot._of(
+                collection, doc_id, document, times.get(doc_id)
+            )
+            for key, _ in query._keyed_by_order((doc_snapshot,)):
+                if _after_start(key, self._start_at) and _before_end(key, self._end_at):
+                    insort(self._matches, (key, doc_snapshot), key=itemgetter(0))
+                    self._keys[path] = key
+        return changed
+
+    def _event(self, collection_path: Path, changes: list[Change]) -> Event | None:
+        query = self._query
+        if not (query._offset or query._limit):
+            return self._unpaginated_event(collection_path, changes)
+
+        old_results = self._results()
+        if not self._apply(collection_path, changes):
+            return None
+        new_results = self._results()
+        old_positions = _positions(old_results)
+        new_positions = _positions(new_results)
+        removed, added, modified = [], [], []
+        for path, old_index in old_positions.items():
+            if path not in new_positions:
+                removed.append(
+                    DocumentChange(
+                        ChangeType.REMOVED, old_results[old_index], old_index, -1
+                    )
+                )
+        for path, new_index in new_positions.items():
+            doc_snapshot = new_results[new_index]
+            old_index = old_positions.get(path)
+            if old_index is None:
+                added.append(
+                    DocumentChange(ChangeType.ADDED, doc_snapshot, -1, new_index)
+                )
+            elif old_results[old_index]._doc is not doc_snapshot._doc:
+                modified.append(
+                    DocumentChange(
+                        ChangeType.MODIFIED, doc_snapshot, old_index, new_index
+                    )
+                )
+        return _event(new_results, removed + added + modified)
+
+    def _unpaginated_event(
+        self, collection_path: Path, changes: list[Change]
+    ) -> Event | None:
+        """
+        Without offset or limit, the results are all the matches, and only the
+        written documents can change: their positions are looked up directly.
+        """
+        old = {}
+        for doc_id, _, _ in changes:
+            path = (*collection_path, doc_id)
+            position = self._position(path)
+            if position >= 0:
+                old[path] = position, self._matches[position][1]
+        changed = self._apply(collection_path, changes)
+        if not changed:
+            return None
+        removed, added, modified = [], [], []
+        for path in dict.fromkeys(changed):
+            old_index, old_snapshot = old.get(path, (-1, None))
+            new_index = self._position(path)
+            if new_index < 0:
+                if old_index >= 0:
+                    removed.append(
+                        DocumentChange(ChangeType.REMOVED, old_snapshot, old_index, -1)
+                    )
+                continue
+            doc_snapshot = self._matches[new_index][1]
+            if old_index < 0:
+                added.append(
+                    DocumentChange(ChangeType.ADDED, doc_snapshot, -1, new_index)
+                )
+            else:
+                modified.append(
+                    DocumentChange(
+                        ChangeType.MODIFIED, doc_snapshot, old_index, new_index
+                    )
+                )
+        return _event(self._results(), removed + added + modified)
+
+
+def _positions(doc_snapshots: list[DocumentSnapshot]) -> dict[Path, int]:
+    return {
+        doc_snapshot._key: position
+        for position, doc_snapshot in enumerate(doc_snapshots)
+    }
+
+
+def _event(
+    doc_snapshots: list[DocumentSnapshot], changes: list[DocumentChange]
+) -> Event | None:
+    if not changes:
+        return None
+    return doc_snapshots, changes, Timestamp.from_now()
@@ -0,0 +1,12 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def contended():
+    """Switches threads as often as possible, to bring out races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from mockfirestore import AsyncMockFirestore, MockFirestore
+
+
+def _values(aggregation_query):
+    (results,) = aggregation_query.get()
+    return {result.alias: result.value for result in results}
+
+
+def _scores(fs):
+    scores = fs.collection("scores")
+    scores.document("a").set({"points": 10, "team": "x"})
+    scores.document("b").set({"points": 2.5, "team": "y"})
+    scores.document("c").set({"points": True, "team": "x"})
+    scores.document("d").set({"team": "x"})
+    return scores
+
+
+def test_count_sum_and_avg_in_one_query():
+    scores = _scores(MockFirestore())
+    query = scores.count().sum("points").avg("points", alias="mean")
+
+    assert _values(query) == {"field_1": 4, "field_2": 12.5, "mean": 6.25}
+
+
+def test_aggregations_apply_the_query_filters_and_pagination():
+    scores = _scores(MockFirestore())
+    team_x = scores.where("team", "==", "x")
+
+    assert _values(team_x.count(alias="n")) == {"n": 3}
+    assert _values(team_x.sum("points", alias="total")) == {"total": 10}
+    top = scores.order_by("points", "DESCENDING").limit(1)
+    assert _values(top.sum("points")) == {"field_1": 10}
+    assert _values(scores.limit(2).count()) == {"field_1": 2}
+
+
+def test_avg_without_numbers_is_none():
+    scores = _scores(MockFirestore())
+
+    assert _values(scores.where("team", "==", "z").avg("points")) == {"field_1": None}
+
+
+def test_limited_aggregations_read_the_documents_stream_returns():
+    fs = MockFirestore()
+    fs.collection("b").document("2").collection("sub").document("x").set({"v": 10})
+    fs.collection("a").document("1").collection("sub").document("y").set({"v": 1})
+    group = fs.collection_group("sub").limit(1)
+
+    assert [doc.to_dict()["v"] for doc in group.stream()] == [1]
+    assert _values(group.sum("v")) == {"field_1": 1}
+
+
+def test_limit_to_last_aggregations_require_an_order():
+    scores = _scores(MockFirestore())
+
+    with pytest.raises(ValueError):
+        _values(scores.limit_to_last(1).count())
+    last = scores.order_by("points").limit_to_last(2)
+    assert _values(last.sum("points")) == {"field_1": 12.5}
+
+
+def test_async_aggregations_over_ordered_and_paginated_queries():
+    async def aggregate():
+        scores = AsyncMockFirestore().collection("scores")
+        for doc_id, points in (("a", 10), ("b", 2.5), ("c", 1)):
+            await scores.document(doc_id).set({"points": points})
+        query = scores.order_by("points", "DESCENDING").limit(2)
+        (results,) = await query.sum("points").get()
+        return results[0].value
+
+    assert asyncio.run(aggregate()) == 12.5
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from mockfirestore import AlreadyExists, MockFirestore
+
+
+def _run_threads(target, *args, count=8):
+    """Runs `target(i, *args)` in `count` threads at once, numbered by `i`."""
+    threads = [threading.Thread(target=target, args=(i, *args)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_batch_creates_race_for_a_document_only_once(contended):
+    fs = MockFirestore()
+
+    def create(i, ref, created):
+        batch = fs.batch()
+        batch.create(ref, {"by": i})
+        # Writes staged after the create leave time for other threads.
+        for j in range(100):
+            batch.set(fs.collection("other").document(f"{i}-{j}"), {})
+        try:
+            batch.commit()
+        except AlreadyExists:
+            return
+        created.append(i)
+
+    for attempt in range(50):
+        ref = fs.collection("c").document(f"d{attempt}")
+        created = []
+        _run_threads(create, ref, created)
+        assert len(created) == 1
+        assert ref.get().to_dict() == {"by": created[0]}
+
+
+def test_bulk_writer_creates_race_for_a_document_only_once(contended):
+    fs = MockFirestore()
+
+    def create(i, ref, failed):
+        bulk_writer = fs.bulk_writer()
+        bulk_writer.on_write_error(lambda failure, _: failed.append(failure))
+        bulk_writer.create(ref, {"by": i})
+        bulk_writer.close()
+
+    for attempt in range(50):
+        ref = fs.collection("c").document(f"d{attempt}")
+        failed = []
+        _run_threads(create, ref, failed)
+        assert len(failed) == 7
+        assert ref.get().exists
+
+
+def test_batch_increments_from_many_threads_all_count(contended):
+    firestore = pytest.importorskip("google.cloud.firestore")
+    fs = MockFirestore()
+    ref = fs.collection("c").document("counter")
+    ref.set({"n": 0})
+
+    def increment(_):
+        for _ in range(500):
+            batch = fs.batch()
+            batch.update(ref, {"n": firestore.Increment(1)})
+            batch.commit()
+
+    _run_threads(increment)
+    assert ref.get().to_dict() == {"n": 4000}
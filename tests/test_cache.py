@@ -0,0 +1,68 @@
+from mockfirestore import MockFirestore
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def _cached_client():
+    fs = MockFirestore()
+    fs.enable_query_cache()
+    fs.collection("c").document("a").set({"n": 1})
+    fs.collection("c").document("b").set({"n": 2})
+    return fs
+
+
+def test_repeated_queries_are_served_from_the_cache():
+    fs = _cached_client()
+    query = fs.collection("c").where("n", ">", 0)
+
+    assert _ids(query) == ["a", "b"]
+    assert _ids(fs.collection("c").where("n", ">", 0)) == ["a", "b"]
+
+    stats = fs.query_cache_stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 1, 1)
+
+
+def test_writes_to_the_collection_invalidate_its_results():
+    fs = _cached_client()
+    query = fs.collection("c").where("n", ">", 1)
+    assert _ids(query) == ["b"]
+
+    fs.collection("c").document("a").update({"n": 3})
+    assert _ids(query) == ["a", "b"]
+    fs.collection("c").document("b").delete()
+    assert _ids(query) == ["a"]
+    assert fs.query_cache_stats().hits == 0
+
+
+def test_cached_results_are_not_changed_through_returned_snapshots():
+    fs = _cached_client()
+    query = fs.collection("c").where("n", "==", 1)
+    (doc,) = query.stream()
+    doc.to_dict()["n"] = 99
+
+    (doc,) = query.stream()
+    assert doc.to_dict() == {"n": 1}
+    assert fs.collection("c").document("a").get().to_dict() == {"n": 1}
+
+
+def test_least_recently_used_results_are_evicted_to_stay_in_budget():
+    fs = MockFirestore()
+    fs.enable_query_cache(max_bytes=2000)
+    for i in range(20):
+        fs.collection("c").document(f"d{i}").set({"n": i})
+    for i in range(20):
+        list(fs.collection("c").where("n", ">=", i).stream())
+
+    stats = fs.query_cache_stats()
+    assert stats.evictions > 0
+    assert stats.size_bytes <= stats.max_bytes
+
+
+def test_the_cache_is_off_unless_enabled():
+    fs = MockFirestore()
+    assert fs.query_cache_stats() is None
+    fs.enable_query_cache()
+    fs.disable_query_cache()
+    assert fs.query_cache_stats() is None
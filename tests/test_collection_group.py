@@ -0,0 +1,54 @@
+from mockfirestore import MockFirestore
+
+
+def _paths(query):
+    return ["/".join(doc.reference._path) for doc in query.stream()]
+
+
+def _client():
+    fs = MockFirestore()
+    fs.collection("sub").document("top").set({"v": 3})
+    fs.collection("b").document("2").collection("sub").document("x").set({"v": 1})
+    fs.collection("a").document("1").collection("sub").document("y").set({"v": 2})
+    fs.collection("a").document("1").collection("other").document("z").set({"v": 1})
+    return fs
+
+
+def test_group_queries_read_every_collection_with_the_id():
+    fs = _client()
+
+    assert sorted(_paths(fs.collection_group("sub"))) == [
+        "a/1/sub/y",
+        "b/2/sub/x",
+        "sub/top",
+    ]
+    assert sorted(_paths(fs.collection_group("sub").where("v", "<", 3))) == [
+        "a/1/sub/y",
+        "b/2/sub/x",
+    ]
+
+
+def test_group_results_are_ordered_across_collections():
+    fs = _client()
+
+    assert _paths(fs.collection_group("sub")) == ["a/1/sub/y", "b/2/sub/x", "sub/top"]
+    assert _paths(fs.collection_group("sub").order_by("v")) == [
+        "b/2/sub/x",
+        "a/1/sub/y",
+        "sub/top",
+    ]
+    assert _paths(fs.collection_group("sub").order_by("v", "DESCENDING").limit(2)) == [
+        "sub/top",
+        "a/1/sub/y",
+    ]
+
+
+def test_group_queries_follow_collections_created_and_deleted():
+    fs = _client()
+    query = fs.collection_group("sub").where("v", ">=", 1)
+    assert len(_paths(query)) == 3
+
+    fs.collection("c").document("3").collection("sub").document("w").set({"v": 5})
+    fs.collection("b").document("2").delete()
+
+    assert sorted(_paths(query)) == ["a/1/sub/y", "c/3/sub/w", "sub/top"]
@@ -0,0 +1,45 @@
+from mockfirestore import MockFirestore
+
+
+def test_documents_keep_references_to_other_documents():
+    fs = MockFirestore()
+    other = fs.collection("c").document("b")
+    other.set({"n": 1})
+    fs.collection("c").document("a").set({"ref": other, "refs": [other]})
+
+    data = fs.collection("c").document("a").get().to_dict()
+    assert data["ref"] is other
+    assert data["refs"] == [other]
+    assert data["ref"].get().to_dict() == {"n": 1}
+
+
+def test_field_paths_mask_a_read():
+    fs = MockFirestore()
+    doc = fs.collection("c").document("a")
+    doc.set({"a": 1, "b": {"c": 2, "d": 3}, "e": 4})
+
+    assert doc.get(["a", "b.c", "missing"]).to_dict() == {"a": 1, "b": {"c": 2}}
+    masked = doc.get(["missing"])
+    assert masked.exists
+    assert masked.to_dict() == {}
+    assert not fs.collection("c").document("z").get(["a"]).exists
+
+
+def test_masked_reads_do_not_share_data_with_the_store():
+    fs = MockFirestore()
+    doc = fs.collection("c").document("a")
+    doc.set({"b": {"c": [1]}})
+
+    doc.get(["b"]).to_dict()["b"]["c"].append(2)
+    assert doc.get().to_dict() == {"b": {"c": [1]}}
+
+
+def test_get_all_masks_every_document():
+    fs = MockFirestore()
+    docs = fs.collection("c")
+    docs.document("a").set({"x": 1, "y": 2})
+    docs.document("b").set({"x": 3, "y": 4})
+
+    field_paths = (field_path for field_path in ["x"])
+    snapshots = fs.get_all([docs.document("a"), docs.document("b")], field_paths)
+    assert [snapshot.to_dict() for snapshot in snapshots] == [{"x": 1}, {"x": 3}]
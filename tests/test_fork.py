@@ -0,0 +1,63 @@
+from mockfirestore import MockFirestore
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def _client():
+    fs = MockFirestore()
+    fs.collection("c").document("a").set({"n": 1})
+    fs.collection("c").document("b").set({"n": 2})
+    fs.collection("c").document("a").collection("sub").document("x").set({"n": 3})
+    fs.collection("other").document("o").set({"n": 4})
+    return fs
+
+
+def test_a_fork_starts_with_the_same_documents():
+    fs = _client()
+    forked = fs.fork()
+
+    assert _ids(forked.collection("c")) == ["a", "b"]
+    assert _ids(forked.collection("c").where("n", ">", 1)) == ["b"]
+    sub = forked.collection("c").document("a").collection("sub")
+    assert [doc.to_dict() for doc in sub.stream()] == [{"n": 3}]
+
+
+def test_writes_to_a_fork_and_its_origin_stay_apart():
+    fs = _client()
+    query = fs.collection("c").where("n", ">=", 1)
+    assert _ids(query) == ["a", "b"]
+    forked = fs.fork()
+
+    forked.collection("c").document("a").update({"n": 10})
+    forked.collection("c").document("z").set({"n": 5})
+    fs.collection("c").document("b").delete()
+    fs.collection("other").document("p").set({"n": 6})
+
+    assert _ids(query) == ["a"]
+    assert fs.collection("c").document("a").get().to_dict() == {"n": 1}
+    assert _ids(forked.collection("c").where("n", ">=", 1)) == ["a", "b", "z"]
+    assert forked.collection("c").document("a").get().to_dict() == {"n": 10}
+    assert _ids(forked.collection("other")) == ["o"]
+
+
+def test_forks_of_forks_are_independent():
+    fs = _client()
+    first = fs.fork()
+    second = first.fork()
+
+    second.collection("c").document("a").set({"n": 7})
+    first.collection("c").document("a").delete()
+
+    assert fs.collection("c").document("a").get().to_dict() == {"n": 1}
+    assert not first.collection("c").document("a").get().exists
+    assert second.collection("c").document("a").get().to_dict() == {"n": 7}
+
+
+def test_a_fork_keeps_declared_indexes():
+    fs = _client()
+    fs.add_index("c", [("n", "ASCENDING"), ("m", "ASCENDING")])
+    query = fs.fork().collection("c").where("n", "==", 1).order_by("m")
+
+    assert query.explain().indexes_used == ["(n ASC, m ASC)"]
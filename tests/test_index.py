@@ -0,0 +1,55 @@
+from mockfirestore import MockFirestore
+
+
+def _ids(query):
+    return sorted(doc.id for doc in query.stream())
+
+
+def _people():
+    fs = MockFirestore()
+    people = fs.collection("people")
+    people.document("ann").set({"age": 31, "tags": ["a", "b"], "home": {"city": "x"}})
+    people.document("bob").set({"age": 25, "tags": ["b"], "home": {"city": "y"}})
+    people.document("cat").set({"age": 31.0, "tags": [], "home": {"city": "x"}})
+    people.document("dan").set({"age": "31", "tags": ["c"]})
+    return fs, people
+
+
+def test_equality_filters_match_equal_values_of_any_numeric_type():
+    _, people = _people()
+
+    assert _ids(people.where("age", "==", 31)) == ["ann", "cat"]
+    assert _ids(people.where("age", "==", "31")) == ["dan"]
+    assert _ids(people.where("home.city", "==", "x")) == ["ann", "cat"]
+    assert _ids(people.where("age", "in", [25, "31"])) == ["bob", "dan"]
+
+
+def test_range_filters_only_match_values_of_their_type():
+    _, people = _people()
+
+    assert _ids(people.where("age", ">", 25)) == ["ann", "cat"]
+    assert _ids(people.where("age", ">=", 25).where("age", "<", 31)) == ["bob"]
+    assert _ids(people.where("age", "<", "4")) == ["dan"]
+
+
+def test_array_filters_match_elements():
+    _, people = _people()
+
+    assert _ids(people.where("tags", "array_contains", "b")) == ["ann", "bob"]
+    assert _ids(people.where("tags", "array_contains_any", ["a", "c"])) == [
+        "ann",
+        "dan",
+    ]
+
+
+def test_indexes_follow_writes_after_they_are_built():
+    _, people = _people()
+    query = people.where("age", "==", 31)
+    assert _ids(query) == ["ann", "cat"]
+
+    people.document("ann").update({"age": 32})
+    people.document("cat").delete()
+    people.document("eve").set({"age": 31})
+
+    assert _ids(query) == ["eve"]
+    assert _ids(people.where("age", ">", 31)) == ["ann"]
@@ -0,0 +1,25 @@
+import time
+
+from mockfirestore import MockFirestore
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_journal_syncs_unsynced_records_after_the_interval(tmp_path):
+    path = str(tmp_path / "journal.log")
+    fs = MockFirestore()
+    fs.enable_journal(path, sync_every=1000, sync_interval=0.05)
+    fs.collection("c").document("d").set({"a": 1})
+
+    deadline = time.monotonic() + 5
+    while not _read(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _read(path)
+    fs.disable_journal()
+
+    replayed = MockFirestore()
+    replayed.replay(path)
+    assert replayed.collection("c").document("d").get().to_dict() == {"a": 1}
@@ -0,0 +1,74 @@
+import asyncio
+
+from mockfirestore import (
+    AsyncCollectionReference,
+    AsyncDocumentReference,
+    DocumentReference,
+    MockFirestore,
+)
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def test_composite_index_keeps_documents_missing_a_trailing_field():
+    fs = MockFirestore()
+    fs.add_index("c", [("a", "ASCENDING"), ("b", "ASCENDING")])
+    fs.collection("c").document("partial").set({"a": 4})
+    fs.collection("c").document("full").set({"a": 4, "b": 1})
+
+    assert _ids(fs.collection("c").where("a", "==", 4)) == ["full", "partial"]
+    assert _ids(fs.collection("c").where("a", ">", 3)) == ["full", "partial"]
+    assert _ids(fs.collection("c").order_by("a")) == ["full", "partial"]
+
+
+def test_composite_index_serves_queries_on_all_of_its_fields():
+    fs = MockFirestore()
+    fs.add_index("c", [("a", "ASCENDING"), ("b", "DESCENDING")])
+    fs.collection("c").document("x").set({"a": 4, "b": 1})
+    fs.collection("c").document("y").set({"a": 4, "b": 2})
+    fs.collection("c").document("z").set({"a": 4})
+
+    query = fs.collection("c").where("a", "==", 4).order_by("b", "DESCENDING")
+    assert query.explain().indexes_used == ["(a ASC, b DESC)"]
+    assert _ids(query) == ["y", "x"]
+
+
+def test_range_and_array_filters_skip_values_of_other_types():
+    fs = MockFirestore()
+    fs.collection("c").document("number").set({"a": 4})
+    fs.collection("c").document("string").set({"a": "y"})
+    fs.collection("c").document("array").set({"a": ["y"]})
+    fs.collection("c").document("boolean").set({"a": True})
+
+    assert _ids(fs.collection("c").where("a", ">", 3)) == ["number"]
+    assert _ids(fs.collection("c").where("a", ">=", "a")) == ["string"]
+    assert _ids(fs.collection("c").where("a", "array_contains", "y")) == ["array"]
+
+
+def test_filters_on_arrays_and_maps_of_other_types_are_not_shared():
+    fs = MockFirestore()
+    docs = fs.collection("c")
+    docs.document("x").set({"a": [1], "m": {"k": 1}})
+
+    assert _ids(docs.where("a", ">", [1])) == []
+    assert _ids(docs.where("a", ">", [True])) == ["x"]
+    assert _ids(docs.where("m", ">", {"k": 1})) == []
+    assert _ids(docs.where("m", ">", {"k": True})) == ["x"]
+
+
+def test_query_cache_keeps_sync_and_async_results_apart():
+    fs = MockFirestore()
+    fs.enable_query_cache()
+    fs.collection("c").document("d").set({"a": 1})
+    query = fs.collection("c").where("a", "==", 1)
+    async_query = AsyncCollectionReference(fs._data, ["c"]).where("a", "==", 1)
+
+    async def stream_async():
+        return [doc async for doc in async_query.stream()]
+
+    assert [type(doc.reference) for doc in query.stream()] == [DocumentReference]
+    assert [type(doc.reference) for doc in asyncio.run(stream_async())] == [
+        AsyncDocumentReference
+    ]
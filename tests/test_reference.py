@@ -0,0 +1,37 @@
+from mockfirestore import MockFirestore
+
+
+def test_references_to_a_path_are_shared():
+    fs = MockFirestore()
+
+    assert fs.collection("c").document("d") is fs.collection("c").document("d")
+    assert fs.collection("c") is fs.collection("c")
+    assert fs.document("c/d") is fs.collection("c").document("d")
+    assert fs.collection("c").document("d") is not MockFirestore().document("c/d")
+
+
+def test_references_compare_and_hash_by_path():
+    fs = MockFirestore()
+    doc = fs.collection("c").document("d")
+
+    assert doc == fs.document("c/d")
+    assert doc != MockFirestore().document("c/d")
+    assert doc != fs.collection("c").document("e")
+    assert len({doc, fs.document("c/d"), fs.document("c/e")}) == 2
+
+
+def test_get_all_reads_each_document_once_in_order():
+    fs = MockFirestore()
+    for doc_id in "abc":
+        fs.collection("c").document(doc_id).set({"id": doc_id})
+    refs = [fs.document(f"c/{doc_id}") for doc_id in "cacb"]
+
+    assert [snapshot.id for snapshot in fs.get_all(refs)] == ["c", "a", "b"]
+
+
+def test_stream_snapshots_know_their_reference():
+    fs = MockFirestore()
+    fs.collection("c").document("a").set({"n": 1})
+
+    (snapshot,) = fs.collection("c").stream()
+    assert snapshot.reference is fs.collection("c").document("a")
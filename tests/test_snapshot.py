@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from mockfirestore import MockFirestore, _snapshot
+
+
+def _client():
+    fs = MockFirestore()
+    fs.collection("users").document("ann").set({
+        "name": "Ann",
+        "joined": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "avatar": b"\x89PNG",
+        "friend": fs.collection("users").document("bob"),
+        "tags": ["a", {"deep": [1, 2.5, None, True]}],
+    })
+    fs.collection("users").document("bob").set({"name": "Bob"})
+    fs.collection("users").document("ann").collection("posts").document("p").set(
+        {"title": "hi"}
+    )
+    return fs
+
+
+def test_saved_documents_load_back_equal(tmp_path):
+    path = str(tmp_path / "store.snapshot")
+    _client().save(path)
+
+    fs = MockFirestore()
+    fs.load(path)
+    ann = fs.collection("users").document("ann").get().to_dict()
+    assert ann["name"] == "Ann"
+    assert ann["joined"] == datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert ann["avatar"] == b"\x89PNG"
+    assert ann["tags"] == ["a", {"deep": [1, 2.5, None, True]}]
+    assert ann["friend"].get().to_dict() == {"name": "Bob"}
+    posts = fs.collection("users").document("ann").collection("posts")
+    assert [doc.to_dict() for doc in posts.stream()] == [{"title": "hi"}]
+
+
+def test_loading_replaces_every_document(tmp_path):
+    path = str(tmp_path / "store.snapshot")
+    _client().save(path)
+
+    fs = MockFirestore()
+    fs.collection("other").document("x").set({"a": 1})
+    fs.load(path)
+    assert not fs.collection("other").document("x").get().exists
+    assert [doc.id for doc in fs.collection("users").stream()] == ["ann", "bob"]
+
+
+def test_a_loaded_store_saves_again_without_reading_its_collections(tmp_path):
+    first, second = str(tmp_path / "first"), str(tmp_path / "second")
+    _client().save(first)
+    fs = MockFirestore()
+    fs.load(first)
+    fs.collection("users").document("cat").set({"name": "Cat"})
+    fs.save(second)
+    fs.save(first)
+
+    for path in (first, second):
+        loaded = MockFirestore()
+        loaded.load(path)
+        users = loaded.collection("users")
+        assert [doc.id for doc in users.stream()] == ["ann", "bob", "cat"]
+        posts = users.document("ann").collection("posts")
+        assert [doc.id for doc in posts.stream()] == ["p"]
+
+
+def test_declared_indexes_are_saved(tmp_path):
+    path = str(tmp_path / "store.snapshot")
+    fs = _client()
+    fs.add_index("users", [("name", "ASCENDING"), ("age", "DESCENDING")])
+    fs.save(path)
+
+    loaded = MockFirestore()
+    loaded.load(path)
+    query = (
+        loaded.collection("users")
+        .where("name", "==", "Ann")
+        .order_by("age", "DESCENDING")
+    )
+    assert query.explain().indexes_used == ["(name ASC, age DESC)"]
+
+
+def test_snapshots_of_other_python_versions_are_rejected(tmp_path, monkeypatch):
+    path = str(tmp_path / "store.snapshot")
+    with monkeypatch.context() as patched:
+        patched.setattr(_snapshot, "_PYTHON", (3, 0))
+        _client().save(path)
+
+    with pytest.raises(ValueError, match="written by Python 3.0"):
+        MockFirestore().load(path)
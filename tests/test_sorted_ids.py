@@ -0,0 +1,53 @@
+from mockfirestore import MockFirestore
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+def _collection(ids):
+    fs = MockFirestore()
+    collection = fs.collection("c")
+    for doc_id in ids:
+        collection.document(doc_id).set({"id": doc_id})
+    return collection
+
+
+def test_documents_stream_in_id_order_whatever_order_they_were_written_in():
+    collection = _collection(["m", "b", "z", "a"])
+    assert _ids(collection) == ["a", "b", "m", "z"]
+
+    collection.document("c").set({})
+    collection.document("m").delete()
+    collection.document("y").set({})
+    assert _ids(collection) == ["a", "b", "c", "y", "z"]
+
+
+def test_queries_without_order_read_documents_by_id():
+    collection = _collection(["d", "b", "c", "a"])
+
+    assert _ids(collection.where("id", ">", "a")) == ["b", "c", "d"]
+    assert _ids(collection.limit(2)) == ["a", "b"]
+    assert _ids(collection.order_by("__name__", "DESCENDING").limit(2)) == [
+        "d",
+        "c",
+    ]
+
+
+def test_id_cursors_seek_into_the_sorted_ids():
+    collection = _collection(["e", "a", "c", "b", "d"])
+    ordered = collection.order_by("__name__")
+    b, e = collection.document("b").get(), collection.document("e").get()
+
+    assert _ids(ordered.start_at(b)) == ["b", "c", "d", "e"]
+    assert _ids(ordered.start_after(b).end_before(e)) == ["c", "d"]
+
+
+def test_listed_ids_do_not_change_with_later_writes():
+    collection = _collection(["a", "b"])
+    ids = collection._data.document_ids(("c",))
+
+    collection.document("c").set({})
+    collection.document("0").set({})
+    assert ids == ["a", "b"]
+    assert collection._data.document_ids(("c",)) == ["0", "a", "b", "c"]
@@ -0,0 +1,71 @@
+import threading
+
+import pytest
+
+from mockfirestore import Aborted, MockFirestore, transactional
+
+
+@transactional
+def _increment(transaction, ref):
+    doc_snapshot = next(transaction.get(ref))
+    transaction.update(ref, {"n": doc_snapshot.get("n") + 1})
+
+
+def test_transactional_increments_from_many_threads_all_count(contended):
+    fs = MockFirestore()
+    ref = fs.collection("c").document("counter")
+    ref.set({"n": 0})
+
+    def increment():
+        for _ in range(1000):
+            _increment(fs.transaction(max_attempts=1000), ref)
+
+    threads = [threading.Thread(target=increment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert ref.get().to_dict() == {"n": 8000}
+
+
+def test_query_read_written_before_it_is_recorded_aborts_the_commit():
+    fs = MockFirestore()
+    fs.enable_query_cache()
+    ref = fs.collection("c").document("d")
+    ref.set({"n": 0})
+    query = fs.collection("c").where("n", ">=", 0)
+    list(query.stream())
+
+    transaction = fs.transaction()
+    transaction._begin()
+    # The cached results are looked up now, but only recorded once iterated.
+    doc_snapshots = transaction.get(query)
+    ref.set({"n": 5})
+    (doc_snapshot,) = doc_snapshots
+    transaction.update(ref, {"n": doc_snapshot.get("n") + 1})
+
+    with pytest.raises(Aborted):
+        transaction.commit()
+    assert ref.get().to_dict() == {"n": 5}
+
+
+def test_retries_after_the_function_aborts_start_clean():
+    fs = MockFirestore()
+    ref = fs.collection("c").document("d")
+    ref.set({"n": 0})
+    attempts = []
+
+    @transactional
+    def write(transaction):
+        attempts.append(transaction.attempts)
+        if len(attempts) == 1:
+            next(transaction.get(ref))
+            transaction.set(fs.collection("c").document("first"), {"n": 1})
+            ref.set({"n": 1})
+            raise Aborted("Try again.")
+        transaction.set(fs.collection("c").document("second"), {"n": 2})
+
+    write(fs.transaction())
+    assert attempts == [1, 2]
+    assert not fs.collection("c").document("first").get().exists
+    assert fs.collection("c").document("second").get().exists
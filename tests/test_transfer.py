@@ -0,0 +1,144 @@
+import gc
+import io
+import json
+from datetime import datetime, timezone
+
+import pytest
+
+from mockfirestore import MockFirestore
+
+
+def _ids(query):
+    return [doc.id for doc in query.stream()]
+
+
+RECORDS = [
+    {"path": "c/b", "data": {"n": 2}},
+    {"path": "c/a", "data": {"n": 1, "m": {"k": [1, 2]}}},
+    {"path": "c/a/sub/x", "data": {"n": 3}},
+]
+
+
+def _assert_imported(fs):
+    assert _ids(fs.collection("c")) == ["a", "b"]
+    assert fs.collection("c").document("a").get().to_dict() == {
+        "n": 1,
+        "m": {"k": [1, 2]},
+    }
+    sub = fs.collection("c").document("a").collection("sub")
+    assert [doc.to_dict() for doc in sub.stream()] == [{"n": 3}]
+
+
+def test_import_reads_lines_and_records():
+    lines = [json.dumps(record) for record in RECORDS]
+
+    for source in (lines, [line.encode() for line in lines], RECORDS):
+        fs = MockFirestore()
+        assert fs.import_documents(source, batch_size=2) == 3
+        _assert_imported(fs)
+
+
+def test_import_reads_files(tmp_path):
+    path = tmp_path / "docs.ndjson"
+    path.write_text("".join(json.dumps(record) + "\n" for record in RECORDS))
+
+    fs = MockFirestore()
+    assert fs.import_documents(str(path)) == 3
+    _assert_imported(fs)
+    fs = MockFirestore()
+    with open(path, "rb") as f:
+        assert fs.import_documents(f) == 3
+    _assert_imported(fs)
+
+
+def test_imported_documents_are_indexed():
+    fs = MockFirestore()
+    fs.collection("c").document("z").set({"n": 2})
+    query = fs.collection("c").where("n", "==", 2)
+    assert _ids(query) == ["z"]
+
+    fs.import_documents(RECORDS)
+    assert _ids(query) == ["b", "z"]
+    assert _ids(fs.collection("c").where("n", "<", 2)) == ["a"]
+
+
+def test_imported_records_do_not_share_data_with_the_source():
+    records = [{"path": "c/a", "data": {"m": {"k": 1}}}]
+    fs = MockFirestore()
+    fs.import_documents(records)
+    records[0]["data"]["m"]["k"] = 2
+
+    assert fs.collection("c").document("a").get().to_dict() == {"m": {"k": 1}}
+
+
+def test_invalid_records_are_rejected():
+    with pytest.raises(ValueError):
+        MockFirestore().import_documents(['{"path": "c/a"}'])
+    with pytest.raises(ValueError):
+        MockFirestore().import_documents(["not json"])
+    with pytest.raises(ValueError):
+        MockFirestore().import_documents([{"path": "c", "data": {}}])
+
+
+def test_import_leaves_the_garbage_collector_alone():
+    def records():
+        for record in RECORDS:
+            assert gc.isenabled()
+            yield record
+
+    MockFirestore().import_documents(records())
+
+
+def _client():
+    fs = MockFirestore()
+    fs.collection("c").document("a").set({
+        "at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "raw": b"\x00\x01",
+        "ref": fs.collection("c").document("b"),
+        "n": [1, {"k": None}],
+    })
+    fs.collection("c").document("b").set({"n": 2})
+    fs.collection("c").document("b").collection("sub").document("x").set({"n": 3})
+    fs.collection("d").document("y").set({"n": 4})
+    return fs
+
+
+def _paths(lines):
+    return [json.loads(line)["path"] for line in lines]
+
+
+def test_export_lines_import_back_equal():
+    fs = _client()
+    imported = MockFirestore()
+    imported.import_documents(fs.export_documents())
+
+    a = imported.collection("c").document("a").get().to_dict()
+    assert a["at"] == datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    assert a["raw"] == b"\x00\x01"
+    assert a["n"] == [1, {"k": None}]
+    assert a["ref"].get().to_dict() == {"n": 2}
+    sub = imported.collection("c").document("b").collection("sub")
+    assert [doc.to_dict() for doc in sub.stream()] == [{"n": 3}]
+
+
+def test_export_only_reads_documents_under_the_prefix():
+    fs = _client()
+
+    assert _paths(fs.export_documents("c/b")) == ["c/b", "c/b/sub/x"]
+    assert _paths(fs.export_documents("d")) == ["d/y"]
+    assert sorted(_paths(fs.export_documents())) == [
+        "c/a",
+        "c/b",
+        "c/b/sub/x",
+        "d/y",
+    ]
+
+
+def test_export_writes_text_and_binary_files():
+    fs = _client()
+    text, binary = io.StringIO(), io.BytesIO()
+
+    assert fs.export_documents("c", file=text) == 3
+    assert fs.export_documents("c", file=binary) == 3
+    assert binary.getvalue().decode() == text.getvalue()
+    assert _paths(text.getvalue().splitlines()) == ["c/a", "c/b", "c/b/sub/x"]
@@ -0,0 +1,24 @@
+from mockfirestore import MockFirestore
+
+
+def test_query_listener_ignores_values_its_filter_cannot_compare():
+    fs = MockFirestore()
+    ref = fs.collection("c").document("d")
+    ref.set({"age": 5})
+    results = []
+    watch = (
+        fs.collection("c")
+        .where("age", ">", 3)
+        .on_snapshot(
+            lambda documents, changes, read_time: results.append(
+                [doc.id for doc in documents]
+            )
+        )
+    )
+
+    ref.set({"age": "y"})
+    ref.set({"age": 4})
+    watch.unsubscribe()
+
+    assert ref.get().to_dict() == {"age": 4}
+    assert results == [["d"], [], ["d"]]